@@ -1,6 +1,8 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, ToolMessage
-from app.utils.config import OPENAI_API_KEY, CHAT_MODEL
+from app.utils.config import CONTEXT_BUDGETS
+from app.chatbot.context import build_context
+from app.chatbot.llm import llm_registry
+from app.chatbot.tool_runner import run_tool, run_tool_calls
 from app.chatbot.prompts import ACCOUNTING_PROMPT
 from app.chatbot.tools import ACCOUNTING_TOOLS
 from app.chatbot.state import GraphState
@@ -8,11 +10,11 @@ from app.utils.custom_logging import custom_logger
 
 log = custom_logger()
 
-def get_llm():
+TOOLS_BY_NAME = {t.name: t for t in ACCOUNTING_TOOLS}
+
+def get_llm(stream: bool = True):
     try:
-        if not OPENAI_API_KEY:
-            raise RuntimeError("No API key found. Set OPENAI_API_KEY in .env")
-        return ChatOpenAI(api_key=OPENAI_API_KEY, model=CHAT_MODEL, temperature=0).bind_tools(ACCOUNTING_TOOLS)
+        return llm_registry.with_tools("accounting", ACCOUNTING_TOOLS, stream)
     except Exception as e:
         log.error(f"Error creating LLM: {e}")
         raise
@@ -24,24 +26,17 @@ async def accounting_agent(state: GraphState):
         last_user_message = messages[-1].content if messages else ""
         
         # Get LLM response - it should call the tool
-        response = await llm.ainvoke([SystemMessage(content=ACCOUNTING_PROMPT)] + messages[-5:])
+        # Recent turns within this node's token budget, older ones through the session summary
+        context = [SystemMessage(content=ACCOUNTING_PROMPT)] + build_context(messages, CONTEXT_BUDGETS["accounting"], state.get("summary"))
+        # Tool planning is not streamed to the user; the answer after the tools is
+        response = await get_llm(stream=False).ainvoke(context)
         
-        tool_messages = []
         if response.tool_calls:
-            # Tool was called - execute all tool calls
-            for tool_call in response.tool_calls:
-                tool_name = tool_call.get("name", "search_accounting")
-                tool_args = tool_call.get("args", {})
-                query = tool_args.get("query", last_user_message)
-                log.info(f"Tool called: {tool_name} with query: {query}")
-                
-                if tool_name == "search_accounting":
-                    tool_result = ACCOUNTING_TOOLS[0].invoke({"query": query})
-                    tool_messages.append(ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"]))
+            # Tool was called - execute all tool calls (concurrently, off the event loop)
+            tool_messages = await run_tool_calls(response.tool_calls, TOOLS_BY_NAME, {"query": last_user_message})
             
             # Get final response with tool results
-            all_messages = messages + [response] + tool_messages
-            final_response = await llm.ainvoke(all_messages)
+            final_response = await llm.ainvoke(context + [response] + tool_messages)
             return {"messages": [final_response], "next": "end"}
         else:
             # No tool call made - force tool usage for data queries
@@ -50,10 +45,10 @@ async def accounting_agent(state: GraphState):
             if any(keyword in last_user_message.lower() for keyword in data_query_keywords):
                 log.info(f"Force tool usage for query: {last_user_message}")
                 # Manually call the tool with the user's query
-                tool_result = ACCOUNTING_TOOLS[0].invoke({"query": last_user_message})
+                tool_result = await run_tool(ACCOUNTING_TOOLS[0], {"query": last_user_message})
                 # Create a tool message and get response from LLM
                 tool_msg = ToolMessage(content=str(tool_result), tool_call_id="manual_call")
-                final_response = await llm.ainvoke(messages + [SystemMessage(content="Use the following search results to answer the user's question:\n" + str(tool_result))])
+                final_response = await llm.ainvoke(context + [SystemMessage(content="Use the following search results to answer the user's question:\n" + str(tool_result))])
                 return {"messages": [final_response], "next": "end"}
         
         return {"messages": [response], "next": "end"}
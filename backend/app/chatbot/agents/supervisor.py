@@ -1,6 +1,9 @@
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage
-from app.utils.config import OPENAI_API_KEY, CHAT_MODEL
+from app.utils.config import CONTEXT_BUDGETS
+from app.chatbot.context import build_context
+from app.chatbot.llm import llm_registry
+from app.chatbot.router import router
+from app.chatbot.tool_runner import emit
 from app.chatbot.prompts import SUPERVISOR_PROMPT
 from app.chatbot.state import GraphState
 from app.utils.custom_logging import custom_logger
@@ -9,29 +12,33 @@ log = custom_logger()
 
 def get_llm():
     try:
-        if not OPENAI_API_KEY:
-            raise RuntimeError("No API key found. Set OPENAI_API_KEY in .env")
-        return ChatOpenAI(api_key=OPENAI_API_KEY, model=CHAT_MODEL, temperature=0)
+        return llm_registry.chat(stream=False)
     except Exception as e:
         log.error(f"Error creating LLM: {e}")
         raise
 
 async def supervisor_agent(state: GraphState):
     try:
-        llm = get_llm()
         messages = state["messages"]
-        last_message = messages[-1].content if messages else ""
         
-        response = await llm.ainvoke([
-            SystemMessage(content=SUPERVISOR_PROMPT),
-            messages[-1] if messages else SystemMessage(content=last_message)
-        ])
+        # Clear-cut queries are routed locally, skipping a model round trip
+        route = router.route(messages[-1].content if messages else "")
+        if route:
+            emit("route", agent=route, source="local")
+            return {"next": route}
+        
+        llm = get_llm()
+        # The latest query plus whatever recent turns fit the budget, so follow-ups route like their topic
+        response = await llm.ainvoke(
+            [SystemMessage(content=SUPERVISOR_PROMPT)] + build_context(messages, CONTEXT_BUDGETS["supervisor"])
+        )
         
         next_agent = response.content.strip().lower()
-        if "accounting" in next_agent:
-            return {"next": "accounting"}
-        return {"next": "support"}
+        route = "accounting" if "accounting" in next_agent else "support"
+        emit("route", agent=route, source="model")
+        return {"next": route}
     except Exception as e:
         log.error(f"Supervisor error: {e}")
+        emit("route", agent="support", source="fallback")
         return {"next": "support"}
 
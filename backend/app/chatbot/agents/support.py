@@ -1,6 +1,8 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, ToolMessage
-from app.utils.config import OPENAI_API_KEY, CHAT_MODEL
+from langchain_core.messages import SystemMessage
+from app.utils.config import CONTEXT_BUDGETS
+from app.chatbot.context import build_context
+from app.chatbot.llm import llm_registry
+from app.chatbot.tool_runner import run_tool_calls
 from app.chatbot.prompts import SUPPORT_PROMPT
 from app.chatbot.tools import SUPPORT_TOOLS
 from app.chatbot.state import GraphState
@@ -8,11 +10,11 @@ from app.utils.custom_logging import custom_logger
 
 log = custom_logger()
 
-def get_llm():
+TOOLS_BY_NAME = {t.name: t for t in SUPPORT_TOOLS}
+
+def get_llm(stream: bool = True):
     try:
-        if not OPENAI_API_KEY:
-            raise RuntimeError("No API key found. Set OPENAI_API_KEY in .env")
-        return ChatOpenAI(api_key=OPENAI_API_KEY, model=CHAT_MODEL, temperature=0).bind_tools(SUPPORT_TOOLS)
+        return llm_registry.with_tools("support", SUPPORT_TOOLS, stream)
     except Exception as e:
         log.error(f"Error creating LLM: {e}")
         raise
@@ -22,15 +24,15 @@ async def support_agent(state: GraphState):
         llm = get_llm()
         messages = state["messages"]
         
-        response = await llm.ainvoke([SystemMessage(content=SUPPORT_PROMPT)] + messages[-5:])
+        # Recent turns within this node's token budget, older ones through the session summary
+        context = [SystemMessage(content=SUPPORT_PROMPT)] + build_context(messages, CONTEXT_BUDGETS["support"], state.get("summary"))
+        # Tool planning is not streamed to the user; the answer after the tools is
+        response = await get_llm(stream=False).ainvoke(context)
         
-        tool_messages = []
         if response.tool_calls:
-            for tool_call in response.tool_calls:
-                tool_result = SUPPORT_TOOLS[0].invoke(tool_call["args"])
-                tool_messages.append(ToolMessage(content=str(tool_result), tool_call_id=tool_call["id"]))
+            tool_messages = await run_tool_calls(response.tool_calls, TOOLS_BY_NAME)
             
-            final_response = await llm.ainvoke(messages + [response] + tool_messages)
+            final_response = await llm.ainvoke(context + [response] + tool_messages)
             return {"messages": [final_response], "next": "end"}
         
         return {"messages": [response], "next": "end"}
@@ -0,0 +1,140 @@
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.chatbot.llm import llm_registry
+from app.chatbot.prompts import SUMMARY_PROMPT
+from app.utils.config import (
+    CHAT_MODEL,
+    SUMMARY_KEEP_TOKENS,
+    SUMMARY_TRIGGER_TOKENS,
+)
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD = 4
+# Fallback estimate when tiktoken or its encoding files are unavailable
+CHARS_PER_TOKEN = 4
+# Most history folded into the summary by one model call
+SUMMARY_CHUNK_TOKENS = 4000
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            try:
+                _encoding = tiktoken.encoding_for_model(CHAT_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            log.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _content(message) -> str:
+    content = message.get("content", "") if isinstance(message, dict) else message.content
+    return content if isinstance(content, str) else str(content)
+
+
+def message_tokens(message) -> int:
+    """Tokens a message (a BaseMessage or a stored {"role", "content"} dict) takes in a prompt"""
+    return count_tokens(_content(message)) + MESSAGE_OVERHEAD
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+
+
+def build_context(messages: List[BaseMessage], budget: int, summary: Optional[str] = None) -> List[BaseMessage]:
+    """
+    The most recent messages that fit in budget tokens (always at least the last one),
+    starting at a user message, preceded by the summary of older turns when there is one.
+    messages are the turns the summary does not cover.
+    """
+    prefix = [summary_message(summary)] if summary else []
+    used = sum(message_tokens(m) for m in prefix)
+
+    window: List[BaseMessage] = []
+    for message in reversed(messages):
+        cost = message_tokens(message)
+        if window and used + cost > budget:
+            break
+        window.append(message)
+        used += cost
+    window.reverse()
+
+    # An answer whose question fell outside the budget only confuses the model
+    while len(window) > 1 and not isinstance(window[0], HumanMessage):
+        window.pop(0)
+    return prefix + window
+
+
+def summary_cut(messages: List[Dict], summarized: int) -> int:
+    """
+    How far the summary should reach given stored messages of which the first summarized
+    are already in it: returns summarized while the rest is under SUMMARY_TRIGGER_TOKENS,
+    otherwise the start of the turn from which about SUMMARY_KEEP_TOKENS remain verbatim
+    """
+    tokens = [message_tokens(m) for m in messages[summarized:]]
+    if sum(tokens) <= SUMMARY_TRIGGER_TOKENS:
+        return summarized
+
+    cut, kept = len(messages), 0
+    for index in range(len(messages) - 1, summarized - 1, -1):
+        kept += tokens[index - summarized]
+        if kept > SUMMARY_KEEP_TOKENS:
+            break
+        cut = index
+    # Fold whole turns, and always leave the latest turn verbatim
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=summarized)
+    while cut < last_user and messages[cut].get("role") != "user":
+        cut += 1
+    return max(summarized, min(cut, last_user))
+
+
+def get_llm():
+    try:
+        return llm_registry.chat()
+    except Exception as e:
+        log.error(f"Error creating LLM: {e}")
+        raise
+
+
+async def summarize(summary: Optional[str], messages: List[Dict]) -> str:
+    """The summary extended with messages, folded in chunks of about SUMMARY_CHUNK_TOKENS"""
+    llm = get_llm()
+    chunk: List[str] = []
+    size = 0
+    for index, message in enumerate(messages):
+        line = f"{message.get('role', 'user')}: {_content(message)}"
+        chunk.append(line)
+        size += count_tokens(line)
+        if size < SUMMARY_CHUNK_TOKENS and index < len(messages) - 1:
+            continue
+        response = await llm.ainvoke(
+            [
+                SystemMessage(content=SUMMARY_PROMPT),
+                HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNext turns:\n" + "\n".join(chunk)),
+            ]
+        )
+        summary = _content(response).strip()
+        chunk, size = [], 0
+    return summary or ""
@@ -0,0 +1,109 @@
+import threading
+from typing import Dict, Optional, Sequence
+
+import httpx
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from langgraph.constants import TAG_NOSTREAM
+
+from app.utils.config import (
+    CHAT_MODEL,
+    LLM_CONNECT_TIMEOUT,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE,
+    LLM_TIMEOUT,
+    OPENAI_API_KEY,
+)
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+
+class LLMRegistry:
+    """
+    Process-wide chat models sharing one pooled async HTTP client per provider.
+
+    Models and their tool-bound variants are built once and reused by every graph node,
+    so a turn's model calls go over kept-alive connections instead of each paying for a
+    new client, TCP connect and TLS handshake. Created lazily; warm() builds everything at
+    startup and aclose() releases the pools at shutdown.
+
+    stream=False variants are tagged so graph streaming skips their tokens: routing and
+    tool-planning calls are not part of the answer the user sees.
+    """
+
+    def __init__(self):
+        self._http: Dict[str, httpx.AsyncClient] = {}
+        self._models: Dict[str, Runnable] = {}
+        self._lock = threading.Lock()
+
+    def http_client(self, provider: str = "openai") -> httpx.AsyncClient:
+        """The pooled async HTTP client of a provider, also usable by openai.AsyncOpenAI"""
+        with self._lock:
+            client = self._http.get(provider)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                    follow_redirects=True,
+                )
+                self._http[provider] = client
+            return client
+
+    def chat(self, stream: bool = True) -> Runnable:
+        """The shared chat model without tools"""
+        if not stream:
+            return self._silent("chat", self.chat)
+        model = self._models.get("chat")
+        if model is None:
+            if not OPENAI_API_KEY:
+                raise RuntimeError("No API key found. Set OPENAI_API_KEY in .env")
+            model = ChatOpenAI(
+                api_key=OPENAI_API_KEY,
+                model=CHAT_MODEL,
+                temperature=0,
+                http_async_client=self.http_client("openai"),
+            )
+            self._models.setdefault("chat", model)
+        return self._models["chat"]
+
+    def with_tools(self, name: str, tools: Sequence, stream: bool = True) -> Runnable:
+        """The shared chat model with tools bound, built on first use and cached under name"""
+        if not stream:
+            return self._silent(name, lambda: self.with_tools(name, tools))
+        model = self._models.get(name)
+        if model is None:
+            model = self.chat().bind_tools(tools)
+            self._models.setdefault(name, model)
+        return self._models[name]
+
+    def _silent(self, name: str, build) -> Runnable:
+        key = f"{name}:nostream"
+        model = self._models.get(key)
+        if model is None:
+            model = build().with_config(tags=[TAG_NOSTREAM])
+            self._models.setdefault(key, model)
+        return self._models[key]
+
+    def warm(self, tool_sets: Optional[Dict[str, Sequence]] = None):
+        """Build the shared model (and the named tool variants) ahead of the first request"""
+        self.chat(stream=False)
+        for name, tools in (tool_sets or {}).items():
+            self.with_tools(name, tools)
+            self.with_tools(name, tools, stream=False)
+
+    async def aclose(self):
+        with self._lock:
+            clients = list(self._http.values())
+            self._http.clear()
+            self._models.clear()
+        for client in clients:
+            await client.aclose()
+
+
+llm_registry = LLMRegistry()
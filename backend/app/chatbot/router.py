@@ -0,0 +1,150 @@
+import math
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.services.data_manager import data_manager
+from app.services.datasets import DatasetSnapshot
+from app.services.search_index import query_terms
+from app.utils.config import ROUTER_MIN_CONFIDENCE, ROUTER_MODE
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+# Domain words the datasets may not spell out, counted as one extra document of their route
+SEED_TERMS = {
+    "accounting": [
+        "salary", "salaries", "payroll", "employee", "employees", "asset", "assets", "transaction",
+        "transactions", "debt", "debts", "loan", "loans", "lender", "profit", "loss", "revenue",
+        "expense", "expenses", "ledger", "account", "accounts", "department", "tds", "emi", "interest",
+        "principal", "depreciation", "book", "inr", "paid", "balance", "financial", "finance",
+    ],
+    "support": [
+        "meter", "meters", "smart", "smets", "outage", "outages", "power", "electricity", "light", "lights",
+        "supply", "ihd", "display", "prepay", "prepayment", "top", "topup", "credit", "tariff", "reading",
+        "readings", "switch", "switching", "supplier", "connection", "signal", "energy", "customer",
+    ],
+}
+# Evidence of a word found in only one route's data, and the cap on a word found in both
+EXCLUSIVE_WEIGHT = 3.0
+SHARED_WEIGHT = 1.0
+# Distinct values read per accounting text column
+MAX_VALUES_PER_COLUMN = 5000
+
+
+def _document_frequencies(documents: Iterable[str]) -> Counter:
+    frequencies: Counter = Counter()
+    for document in documents:
+        frequencies.update(set(query_terms(document)))
+    return frequencies
+
+
+def _accounting_documents(datasets: DatasetSnapshot) -> Iterable[str]:
+    for name, table in datasets.accounting.items():
+        yield name.rsplit(".", 1)[0].replace("_", " ")
+        for column in table.df.columns:
+            yield str(column).replace("_", " ")
+            if column in table.kinds:
+                continue
+            for value in table.df[column].dropna().astype(str).unique()[:MAX_VALUES_PER_COLUMN]:
+                yield value
+    yield " ".join(SEED_TERMS["accounting"])
+
+
+def _support_documents(datasets: DatasetSnapshot) -> Iterable[str]:
+    support = datasets.support
+    if support is not None:
+        df = support.df
+        for category in df["Category"].dropna().unique():
+            yield str(category)
+        for column in ("Customer_Query", "Evidence_Based_Answer"):
+            for value in df[column].dropna().astype(str):
+                yield value
+    yield " ".join(SEED_TERMS["support"])
+
+
+class KeywordRouter:
+    """
+    Local first stage of routing, in front of the supervisor model call.
+
+    Each route's vocabulary comes from its data: for accounting the file and column names
+    and the text values of every table (employee names, departments, asset names...), for
+    support the categories, queries and answers of the knowledge base. A word found in one
+    route's data only is strong evidence for it; a word found in both is weak evidence for
+    the route using it more. The summed evidence gives the route's probability: at
+    min_confidence or above the route is taken directly, otherwise (no known words, or
+    words of both kinds) the supervisor model decides. Rebuilt whenever the dataset
+    version changes.
+    """
+
+    def __init__(self, min_confidence: float = ROUTER_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self._version = None
+        self._weights: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.metrics = {"local": 0, "fallback": 0}
+
+    def _build(self, datasets: DatasetSnapshot):
+        accounting = _document_frequencies(_accounting_documents(datasets))
+        support = _document_frequencies(_support_documents(datasets))
+        # Positive weights are evidence for accounting, negative for support
+        weights = {}
+        for term in accounting.keys() | support.keys():
+            if term not in support:
+                weights[term] = EXCLUSIVE_WEIGHT
+            elif term not in accounting:
+                weights[term] = -EXCLUSIVE_WEIGHT
+            else:
+                weight = math.log((accounting[term] + 1) / (support[term] + 1))
+                weights[term] = max(-SHARED_WEIGHT, min(SHARED_WEIGHT, weight))
+        self._weights = weights
+        self._version = datasets.version
+        log.info(f"Router vocabulary built: {len(weights)} terms at dataset version {datasets.version}")
+
+    def score(self, text: str) -> Tuple[Optional[str], float]:
+        """The likelier route for text and its probability; (None, 0.5) when no word is known"""
+        datasets = data_manager.datasets
+        if self._version != datasets.version:
+            with self._lock:
+                if self._version != datasets.version:
+                    self._build(datasets)
+
+        weights = self._weights
+        known = [weights[t] for t in set(query_terms(text)) if t in weights]
+        if not known:
+            return None, 0.5
+        evidence = sum(known)
+        p_accounting = 1 / (1 + math.exp(-evidence))
+        if p_accounting >= 0.5:
+            return "accounting", p_accounting
+        return "support", 1 - p_accounting
+
+    def route(self, text: str) -> Optional[str]:
+        """The route to take without asking the model, or None when the query is ambiguous"""
+        if (ROUTER_MODE or "").lower() != "local":
+            return None
+        try:
+            route, confidence = self.score(text)
+        except Exception as e:
+            log.warning(f"Local routing failed, asking supervisor: {e}")
+            route, confidence = None, 0.0
+
+        if route is not None and confidence >= self.min_confidence:
+            self.metrics["local"] += 1
+            log.info(f"Routed to {route} locally (confidence {confidence:.3f})")
+            return route
+        self.metrics["fallback"] += 1
+        log.info(f"Routing ambiguous (best {route} at {confidence:.3f}), asking supervisor")
+        return None
+
+    def stats(self) -> Dict:
+        decided = self.metrics["local"] + self.metrics["fallback"]
+        return {
+            "mode": (ROUTER_MODE or "").lower(),
+            "min_confidence": self.min_confidence,
+            **self.metrics,
+            "local_rate": round(self.metrics["local"] / decided, 4) if decided else 0.0,
+        }
+
+
+router = KeywordRouter()
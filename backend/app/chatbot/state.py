@@ -1,8 +1,10 @@
-from typing import TypedDict, Annotated, List
+from typing import TypedDict, Annotated, List, Optional
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
 class GraphState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     next: str
+    summary: Optional[str]      # rolling summary of turns older than the context window
+    summary_upto: int           # messages of the conversation folded into summary; messages holds the rest
 
@@ -0,0 +1,90 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from langchain_core.messages import ToolMessage
+from langgraph.config import get_stream_writer
+
+from app.utils.config import TOOL_TIMEOUT, TOOL_TIMEOUTS, TOOL_WORKERS
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+# Tools are synchronous pandas/numpy work over the in-process datasets, so they run on a
+# bounded thread pool instead of the event loop (numpy releases the GIL in its kernels)
+executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+
+
+def emit(event: str, **data):
+    """Send a typed progress event to the streamed graph run (no-op outside one)"""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer({"event": event, **data})
+
+
+async def run_tool(tool, args: Dict) -> str:
+    """
+    Invoke a tool on the executor, announcing its start and its end with the time it took.
+    A tool that exceeds its timeout (TOOL_TIMEOUTS, else TOOL_TIMEOUT) yields an error
+    result; its thread finishes in the background and the result is dropped. The timeout
+    counts from when a thread picks the call up, not while it waits for a free thread.
+    """
+    emit("tool_start", tool=tool.name, args=args)
+    timeout = TOOL_TIMEOUTS.get(tool.name, TOOL_TIMEOUT)
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    queued_at = start = time.perf_counter()
+    call = None
+    ok = False
+
+    def work():
+        loop.call_soon_threadsafe(started.set)
+        return context.run(tool.invoke, args)
+
+    try:
+        # Run in a copy of this context so the tool's callbacks stay under the graph run
+        context = contextvars.copy_context()
+        call = loop.run_in_executor(executor, work)
+        await started.wait()
+        start = time.perf_counter()
+        result = str(await asyncio.wait_for(call, timeout))
+        ok = not result.startswith("Error")
+        return result
+    except asyncio.TimeoutError:
+        log.warning(f"Tool {tool.name} timed out after {timeout}s with args {args}")
+        return f"Error: {tool.name} timed out after {timeout:g}s"
+    except Exception as e:
+        log.error(f"Tool {tool.name} failed: {e}")
+        return f"Error: {str(e)}"
+    finally:
+        if call is not None:
+            # A call still waiting for a thread when the turn is cancelled never runs
+            call.cancel()
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        queued_ms = round((start - queued_at) * 1000, 1)
+        log.info(f"Tool {tool.name} took {duration_ms} ms after {queued_ms} ms queued")
+        emit("tool_end", tool=tool.name, duration_ms=duration_ms, ok=ok)
+
+
+async def run_tool_calls(tool_calls: List[Dict], tools_by_name: Dict, default_args: Optional[Dict] = None) -> List[ToolMessage]:
+    """
+    Run the tool calls of one model response concurrently; returns their ToolMessages in
+    call order. Every call gets an answer (the model requires one per call id), unknown
+    tools an error.
+    """
+
+    async def answer(tool_call: Dict) -> ToolMessage:
+        name = tool_call.get("name")
+        args = tool_call.get("args") or default_args or {}
+        log.info(f"Tool called: {name} with args: {args}")
+        if name in tools_by_name:
+            content = await run_tool(tools_by_name[name], args)
+        else:
+            content = f"Error: unknown tool '{name}'"
+        return ToolMessage(content=content, tool_call_id=tool_call["id"])
+
+    return list(await asyncio.gather(*(answer(tool_call) for tool_call in tool_calls)))
@@ -1,8 +1,21 @@
+from typing import List, Literal, Optional, Union
 from langchain_core.tools import tool
+from pydantic import BaseModel, Field
 from app.services.data_manager import data_manager
 
 @tool
-def search_accounting(query: str) -> str:
+def search_accounting(
+    query: str = "",
+    file_name: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    amount_column: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    date_column: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    max_rows: Optional[int] = None,
+) -> str:
     """Search accounting/financial data across all CSV files. 
     
     Searches for any matching text in:
@@ -18,23 +31,106 @@ def search_accounting(query: str) -> str:
     - "base salary" → finds salary information
     - "gurgaon" → finds location-based records
     - Use employee names, amounts, dates, departments, or any relevant keywords.
+
+    Optional filters (combine with or replace the keyword query; leave query empty to filter only):
+    - file_name: restrict to one file, e.g. "transaction.csv"
+    - min_amount / max_amount: inclusive bounds on INR amount columns (plain numbers, no commas),
+      or on `amount_column` only, e.g. amount_column="Net Pay"
+    - date_from / date_to: inclusive date bounds as YYYY-MM-DD or YYYY-MM (a month covers the
+      whole month), on all date columns or on `date_column` only, e.g. date_column="Maturity Date"
+
+    Filter examples:
+    - "transactions in November 2024" → file_name="transaction.csv", date_from="2024-11", date_to="2024-11"
+    - "assets costing over 5 lakh" → file_name="Asset.csv", min_amount=500000, amount_column="Cost (INR)"
+    - "debts maturing before 2030" → file_name="debt_final.csv", date_to="2029-12-31", date_column="Maturity Date"
+
+    Output is pipe-delimited and capped to a row/token budget (best keyword matches first); the
+    response says how many rows were omitted. Keep it small:
+    - columns: only return these columns (the ID column is always included), e.g. ["Name", "Net Pay"]
+    - max_rows: return at most this many rows
     """
     try:
-        return data_manager.search_accounting(query, None)
+        return data_manager.search_accounting(
+            query,
+            file_name,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            amount_column=amount_column,
+            date_from=date_from,
+            date_to=date_to,
+            date_column=date_column,
+            columns=columns,
+            max_rows=max_rows,
+        )
     except Exception as e:
         return f"Error: {str(e)}"
 
+class AccountingFilter(BaseModel):
+    column: str = Field(description="Column name exactly as in the file, e.g. 'Status' or 'Net Pay'")
+    op: Literal["eq", "ne", "gt", "gte", "lt", "lte", "contains", "in"] = "eq"
+    value: Union[str, float, List[str]] = Field(
+        description="Amounts as plain numbers, dates as YYYY-MM-DD or YYYY-MM, a list for 'in'"
+    )
+
 @tool
-def search_support(query: str) -> str:
+def aggregate_accounting(
+    file_name: str,
+    aggregate: Literal["sum", "mean", "min", "max", "count"] = "count",
+    column: Optional[str] = None,
+    group_by: Optional[str] = None,
+    filters: Optional[List[AccountingFilter]] = None,
+    limit: int = 20,
+) -> str:
+    """Compute totals, averages, min/max or counts over one accounting CSV file.
+
+    Use this instead of search_accounting whenever the answer is a number computed over
+    many rows (totals, averages, counts, per-group breakdowns). Amounts are real numbers
+    here, so do not add anything up yourself.
+
+    Files and their numeric/date columns:
+    - Asset.csv: Cost (INR), Book Value, Purchase Date
+    - COA_final.csv: GL Code
+    - debt_final.csv: Principal, Interest Rate, Monthly EMI, Maturity Date
+    - Human_Capital_final.csv: Base Salary, TDS Deducted, Net Pay, Last Paid Date
+    - profit&Loss_final.csv: Current Month (INR), Previous Month (INR), YTD Total (INR), % Change
+    - transaction.csv: Debit (INR), Credit (INR), Date, GL_Code
+
+    Examples:
+    - "total net pay by department" → file_name="Human_Capital_final.csv", aggregate="sum",
+      column="Net Pay", group_by="Department"
+    - "sum of EMIs on active debts" → file_name="debt_final.csv", aggregate="sum", column="Monthly EMI",
+      filters=[{"column": "Status", "op": "eq", "value": "Active"}]
+    - "how many transactions in January 2024" → file_name="transaction.csv", aggregate="count",
+      filters=[{"column": "Date", "op": "eq", "value": "2024-01"}]
+    """
+    try:
+        return data_manager.aggregate_accounting(
+            file_name,
+            filters=[f.model_dump() if isinstance(f, BaseModel) else f for f in filters or []],
+            group_by=group_by,
+            aggregate=aggregate,
+            column=column,
+            limit=limit,
+        )
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+@tool
+def search_support(query: str, mode: Optional[str] = None) -> str:
     """
     Search the smart metering support knowledge base for relevant customer queries and evidence-based answers.
 
-    This tool runs a combined keyword and simple semantic-style search over the support CSV and returns
+    This tool runs a BM25 keyword-relevance search over the support CSV and returns
     up to 3 relevance-ranked chunks. Each chunk contains up to 5 rows, and each row includes:
     - Customer_Query
     - Evidence_Based_Answer
     - Category
 
+    `mode` selects the retrieval backend and is normally left unset (server default):
+    - "bm25": keyword relevance over the support CSV rows (described above)
+    - "vector": dense similarity search over the smart meter FAQ document index; returns up to
+      3 FAQ passages instead of CSV rows. Useful when the question shares few words with the CSV.
+
     Intended usage (by the LLM agent):
     - ALWAYS call this tool first for any smart metering support question
     - Pass the user's full question as the `query`
@@ -47,10 +143,10 @@ def search_support(query: str) -> str:
     - Either ask a brief clarifying question or give only high-level, non-fabricated guidance.
     """
     try:
-        return data_manager.search_support(query)
+        return data_manager.search_support(query, mode)
     except Exception as e:
         return f"Error: {str(e)}"
 
-ACCOUNTING_TOOLS = [search_accounting]
+ACCOUNTING_TOOLS = [search_accounting, aggregate_accounting]
 SUPPORT_TOOLS = [search_support]
 
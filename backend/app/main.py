@@ -1,22 +1,36 @@
 from typing import Dict, List, Optional
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, Header, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
 import uuid
 from datetime import datetime
+from app.utils.config import MAX_PAGE_SIZE, SESSION_PAGE_SIZE, STREAM_FLUSH_CHARS, STREAM_FLUSH_INTERVAL
 from app.utils.custom_logging import custom_logger
 from app.chatbot.graph import graph
+from app.chatbot.llm import llm_registry
+from app.chatbot.router import router
+from app.chatbot.tools import ACCOUNTING_TOOLS, SUPPORT_TOOLS
 from app.chatbot.state import GraphState
+from app.services.answer_cache import answer_cache
 from app.services.openai_session_service import openai_session_service
+from app.services.data_manager import data_manager
+from app.services.turn_streams import turn_streams
 
 load_dotenv('.env')
 log = custom_logger()
 app = FastAPI()
 
+# Graph nodes whose model output is the answer shown to the user
+ANSWER_NODES = {"accounting", "support"}
+# Keep proxies from buffering or caching event streams
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +44,7 @@ class ChatRequest(BaseModel):         #Define what frontend sends
     user_text: str
     chat: Optional[List[Dict]] = None
     session_id: str = "default"
+    stream_id: Optional[str] = None     # /chat-events only: resume this turn instead of starting one
 
 class SessionRequest(BaseModel):                 # used when creating a new session
     session_id: Optional[str] = None
@@ -60,50 +75,147 @@ def messages_to_dict(messages: List[BaseMessage]) -> List[Dict]:       #used bef
         log.error(f"Error converting messages to dict: {e}")
     return result
 
+@app.on_event("startup")
+async def start_background_workers():
+    # Hot reload: datasets changed in MongoDB are picked up without a restart
+    data_manager.start_watcher()
+    openai_session_service.mirror.start()
+    # Build the shared models now rather than on the first request
+    try:
+        llm_registry.warm({"accounting": ACCOUNTING_TOOLS, "support": SUPPORT_TOOLS})
+    except Exception as e:
+        log.error(f"Error creating LLM clients: {e}")
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    data_manager.stop_watcher()
+    await openai_session_service.mirror.stop()
+    await llm_registry.aclose()
+
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "search_cache": data_manager.cache_stats(),
+        "conversation_mirror": openai_session_service.mirror.stats(),
+        "session_cache": openai_session_service.cache_stats(),
+        "router": router.stats(),
+        "turn_streams": turn_streams.stats(),
+        "answer_cache": answer_cache.stats(),
+    }
 
-async def stream_chat(user_text: str, session_id: str = "default", chat_history: Optional[List[Dict]] = None):
+async def run_turn(user_text: str, session_id: str = "default", chat_history: Optional[List[Dict]] = None):
+    """
+    One chat turn as typed events (name, data): route, tool_start, tool_end, delta (answer
+    text as it is generated), then done, or error if the turn failed.
+
+    The opening question of a conversation, when the router places it on a cached route,
+    is first looked up in the answer cache; a hit is answered from it without running
+    the graph (route event with source "cache", then the answer as one delta).
+    """
     try:
+        started = time.monotonic()
         # Get or create session
+        version = None
+        summary = None
+        summary_upto = 0
         if not chat_history:
-            chat_history = openai_session_service.get_chat_history(session_id)
+            # Only the turns after the summary are loaded; the summary stands in for the rest
+            chat_history, version, summary, summary_upto = await openai_session_service.get_turn_state(session_id)
             # If no history exists, create new session
-            if not chat_history:
-                openai_session_service.create_session(session_id, user_text)
+            if not chat_history and not summary_upto:
+                await openai_session_service.create_session(session_id, user_text)
+                version = await openai_session_service.get_version(session_id)
         
         messages = dict_to_messages(chat_history)                #convert history to langchain messgae
         messages.append(HumanMessage(content=user_text))
+
+        # Answers are cached per route and dataset version, so only a confidently routed
+        # question can use them; and only one asked without earlier turns, since the
+        # answer to a follow-up depends on what came before
+        cache_route, confidence = None, 0.0
+        if len(messages) == 1 and not summary_upto:
+            try:
+                cache_route, confidence = router.score(user_text)
+            except Exception as e:
+                log.warning(f"Answer cache skipped, routing failed: {e}")
+        if confidence < router.min_confidence or not answer_cache.enabled(cache_route):
+            cache_route = None
+        dataset_version = data_manager.version
+        if cache_route:
+            # A semantic answer cache embeds the question, so it runs off the event loop
+            cached = await asyncio.to_thread(answer_cache.get, user_text, cache_route, dataset_version)
+            if cached:
+                yield "route", {"agent": cache_route, "source": "cache"}
+                yield "delta", {"text": cached}
+                await openai_session_service.save_chat(session_id, messages_to_dict(messages + [AIMessage(content=cached)]), version, summary_upto)
+                yield "done", {"chars": len(cached), "cached": True, "duration_ms": round((time.monotonic() - started) * 1000, 1)}
+                return
         
         state: GraphState = {             #tells langgraph conversation , Start from supervisor
             "messages": messages,
-            "next": "supervisor"
+            "next": "supervisor",
+            "summary": summary,         # each node windows messages to its token budget after this
+            "summary_upto": summary_upto,
         }
         
-        final_state = None
-        async for chunk in graph.astream(state):
-            final_state = chunk
-        
+        # Answer tokens are forwarded as the agent's final model call produces them
+        # ("messages" mode), coalesced into deltas of a few words; "custom" mode carries
+        # the nodes' route and tool events; "updates" mode gives the complete answer
+        # message once its node finishes
         final_response = ""
-        if final_state:
-            for node_name, node_state in final_state.items():
-                if "messages" in node_state and node_state["messages"]:
-                    for msg in node_state["messages"]:
+        routed_to = None
+        streamed = False
+        pending = []
+        pending_chars = 0
+        last_flush = time.monotonic()
+        async for mode, data in graph.astream(state, stream_mode=["messages", "custom", "updates"]):
+            if mode == "messages":
+                chunk, metadata = data
+                if metadata.get("langgraph_node") in ANSWER_NODES and isinstance(chunk.content, str) and chunk.content:
+                    pending.append(chunk.content)
+                    pending_chars += len(chunk.content)
+                    if pending_chars >= STREAM_FLUSH_CHARS or time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                        yield "delta", {"text": "".join(pending)}
+                        streamed = True
+                        pending, pending_chars, last_flush = [], 0, time.monotonic()
+            elif mode == "custom":
+                event = dict(data)
+                name = event.pop("event", "progress")
+                if name == "route":
+                    routed_to = event.get("agent")
+                yield name, event
+            else:
+                for node_state in data.values():
+                    for msg in (node_state or {}).get("messages") or []:
                         if isinstance(msg, AIMessage) and msg.content:
                             final_response = msg.content
-                            break
+        if pending:
+            yield "delta", {"text": "".join(pending)}
+            streamed = True
         
         if final_response:
-            for char in final_response:   #send response charcater by character
-                yield char
+            if not streamed:
+                # Answered by a call that is not streamed (no tools were needed)
+                yield "delta", {"text": final_response}
             updated_messages = messages + [AIMessage(content=final_response)]
-            openai_session_service.save_chat(session_id, messages_to_dict(updated_messages)) # save chat history
+            await openai_session_service.save_chat(session_id, messages_to_dict(updated_messages), version, summary_upto) # save chat history
+            if cache_route and routed_to == cache_route:
+                await asyncio.to_thread(answer_cache.put, user_text, cache_route, dataset_version, final_response)
         else:
-            yield "No response generated."
+            yield "delta", {"text": "No response generated."}
+        yield "done", {"chars": len(final_response), "cached": False, "duration_ms": round((time.monotonic() - started) * 1000, 1)}
     except Exception as e:
         log.error(f"Stream chat error: {e}")
-        yield f"Error: {str(e)}"
+        yield "error", {"message": str(e)}
+
+async def stream_chat(user_text: str, session_id: str = "default", chat_history: Optional[List[Dict]] = None):
+    """The answer text of a turn, for the plain-text endpoints"""
+    async for event, data in run_turn(user_text, session_id, chat_history):
+        if event == "delta":
+            yield data["text"]
+        elif event == "error":
+            yield f"Error: {data['message']}"
 
 @app.post("/chat-stream")        # used  for live typing
 async def chat_stream(request: ChatRequest):
@@ -112,6 +224,36 @@ async def chat_stream(request: ChatRequest):
             yield chunk
     return StreamingResponse(event_generator(), media_type="text/plain")
 
+@app.post("/chat-events")        # Server-Sent Events: typed progress and answer events
+async def chat_events(request: ChatRequest, last_event_id: Optional[str] = Header(None)):
+    """
+    Run a turn and stream its events as SSE: start (with the stream_id), route,
+    tool_start, tool_end, delta, then done or error, with heartbeat comments while idle.
+    The turn runs to completion even if the client disconnects. Sending its stream_id
+    again (or GET /chat-events/{stream_id}) with Last-Event-ID resumes it; a request with
+    a stream_id never starts a turn, and gets 404 once the stream is gone.
+
+    Events are kept in the shared stream store as well, so a resume reaching another
+    worker follows the turn from there; after STREAM_RETENTION it gets 404 and should
+    reload the session instead of asking again.
+    """
+    if request.stream_id:
+        stream = await turn_streams.find(request.stream_id)
+        if stream is None:
+            return JSONResponse({"error": f"Unknown or expired stream '{request.stream_id}'"}, status_code=404)
+    else:
+        stream_id = f"stream_{uuid.uuid4().hex[:12]}"
+        stream = turn_streams.start(stream_id, request.session_id, run_turn(request.user_text, request.session_id, request.chat))
+    return StreamingResponse(turn_streams.sse(stream, last_event_id), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.get("/chat-events/{stream_id}")
+async def resume_chat_events(stream_id: str, last_event_id: Optional[str] = Header(None)):
+    """Resume a turn's events after Last-Event-ID; 404 once the turn is gone (reload the session then)"""
+    stream = await turn_streams.find(stream_id)
+    if stream is None:
+        return JSONResponse({"error": f"Unknown or expired stream '{stream_id}'"}, status_code=404)
+    return StreamingResponse(turn_streams.sse(stream, last_event_id), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/get-chat-response")       # full response at once no streaming
 async def get_chat_response(request: ChatRequest):
     try:
@@ -123,42 +265,52 @@ async def get_chat_response(request: ChatRequest):
         log.error(f"Get chat response error: {e}")
         return f"Error: {str(e)}"
 
-@app.get("/sessions")                                     #list alll sessions
-async def get_sessions():
-    """Get all chat sessions"""
+@app.get("/sessions")                                     #list sessions, newest first
+async def get_sessions(
+    limit: int = Query(SESSION_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Get a page of chat sessions; pass next_cursor back as cursor for the next page"""
     try:
-        sessions = openai_session_service.get_all_sessions()
-        return {"sessions": sessions}
+        return await openai_session_service.get_sessions_page(limit, cursor)
     except Exception as e:
         log.error(f"Error getting sessions: {e}")
-        return {"sessions": [], "error": str(e)}
+        return {"sessions": [], "next_cursor": None, "error": str(e)}
 
 @app.post("/sessions/new")                              #create new sessions
 async def create_session(request: SessionRequest):
     """Create a new chat session"""
     try:
         session_id = request.session_id or f"session_{uuid.uuid4().hex[:12]}"
-        openai_session_service.create_session(session_id)
+        await openai_session_service.create_session(session_id)
         return {"session_id": session_id, "message": "Session created successfully"}
     except Exception as e:
         log.error(f"Error creating session: {e}")
         return {"error": str(e)}
 
 @app.get("/sessions/{session_id}/messages")                                 #get chat history
-async def get_session_messages(session_id: str):
-    """Get all messages for a specific session"""
+async def get_session_messages(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """
+    Get the messages of a session: all of them, or with limit the latest page; pass
+    next_cursor back as cursor to get the page of older messages before it
+    """
     try:
-        messages = openai_session_service.get_chat_history(session_id)
-        return {"messages": messages}
+        if limit is None and cursor is None:
+            return {"messages": await openai_session_service.get_chat_history(session_id), "next_cursor": None}
+        return await openai_session_service.get_messages_page(session_id, limit or SESSION_PAGE_SIZE, cursor)
     except Exception as e:
         log.error(f"Error getting session messages: {e}")
-        return {"messages": [], "error": str(e)}
+        return {"messages": [], "next_cursor": None, "error": str(e)}
 
 @app.delete("/sessions/{session_id}")
 async def delete_session(session_id: str):
     """Delete a chat session"""
     try:
-        openai_session_service.delete_session(session_id)
+        await openai_session_service.delete_session(session_id)
         return {"message": "Session deleted successfully"}
     except Exception as e:
         log.error(f"Error deleting session: {e}")
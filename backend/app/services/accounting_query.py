@@ -0,0 +1,157 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.accounting_schema import AMOUNT, DATE, NUMBER, PERCENT, parse_date_bound
+
+FILTER_OPS = ("eq", "ne", "gt", "gte", "lt", "lte", "contains", "in")
+AGGREGATES = ("sum", "mean", "min", "max", "count")
+NUMERIC_KINDS = (AMOUNT, NUMBER, PERCENT)
+
+
+def resolve_column(df: pd.DataFrame, name: str) -> str:
+    wanted = str(name).strip().lower()
+    for column in df.columns:
+        if column.lower() == wanted:
+            return column
+    raise ValueError(f"Unknown column '{name}'. Columns: {', '.join(df.columns)}")
+
+
+def _to_number(value) -> float:
+    return float(str(value).replace(",", "").rstrip("%").strip())
+
+
+def _date_mask(values: pd.Series, op: str, value) -> pd.Series:
+    # A date bound covers the whole period it names ("2024-11" is the entire month)
+    start, end = parse_date_bound(value), parse_date_bound(value, end=True)
+    if op == "eq":
+        return (values >= start) & (values <= end)
+    if op == "ne":
+        return (values < start) | (values > end)
+    if op == "gt":
+        return values > end
+    if op == "gte":
+        return values >= start
+    if op == "lt":
+        return values < start
+    if op == "lte":
+        return values <= end
+    raise ValueError(f"Operator '{op}' is not supported on date columns")
+
+
+def _numeric_mask(values: pd.Series, op: str, value) -> pd.Series:
+    if op == "in":
+        return values.isin([_to_number(v) for v in value])
+    number = _to_number(value)
+    if op == "eq":
+        return values == number
+    if op == "ne":
+        return values != number
+    if op == "gt":
+        return values > number
+    if op == "gte":
+        return values >= number
+    if op == "lt":
+        return values < number
+    if op == "lte":
+        return values <= number
+    raise ValueError(f"Operator '{op}' is not supported on numeric columns")
+
+
+def _text_mask(values: pd.Series, op: str, value) -> pd.Series:
+    text = values.astype(str).str.lower()
+    if op == "in":
+        return text.isin([str(v).lower() for v in value])
+    wanted = str(value).lower()
+    if op == "eq":
+        return text == wanted
+    if op == "ne":
+        return text != wanted
+    if op == "contains":
+        return text.str.contains(wanted, regex=False)
+    raise ValueError(f"Operator '{op}' is not supported on text columns")
+
+
+def filter_mask(df: pd.DataFrame, kinds: Dict[str, str], filters: List[Dict]) -> np.ndarray:
+    """AND of all filters as a boolean row mask over a typed accounting table"""
+    mask = np.ones(len(df), dtype=bool)
+    for f in filters or []:
+        column = resolve_column(df, f.get("column", ""))
+        op = str(f.get("op", "eq")).lower()
+        value = f.get("value")
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unknown operator '{op}'. Use one of: {', '.join(FILTER_OPS)}")
+        if op == "in" and not isinstance(value, (list, tuple)):
+            value = [v.strip() for v in str(value).split(",")]
+
+        kind = kinds.get(column)
+        if kind == DATE and op not in ("contains", "in"):
+            column_mask = _date_mask(df[column], op, value)
+        elif kind in NUMERIC_KINDS and op != "contains":
+            column_mask = _numeric_mask(df[column], op, value)
+        else:
+            column_mask = _text_mask(df[column], op, value)
+        mask &= column_mask.fillna(False).to_numpy(dtype=bool)
+    return mask
+
+
+def _format_value(value) -> str:
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, (float, np.floating)):
+        return f"{value:.0f}" if float(value).is_integer() else f"{value:.2f}"
+    return str(value)
+
+
+def run_aggregate(
+    df: pd.DataFrame,
+    kinds: Dict[str, str],
+    filters: Optional[List[Dict]] = None,
+    group_by: Optional[str] = None,
+    aggregate: str = "count",
+    column: Optional[str] = None,
+    limit: int = 20,
+) -> str:
+    """
+    Filter a typed accounting table, optionally group it, and aggregate one column.
+
+    Returns a compact pipe-delimited result: one line per group (largest first, capped at
+    limit) with the matching row count, or a single line when there is no grouping.
+    """
+    aggregate = str(aggregate or "count").lower()
+    if aggregate not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{aggregate}'. Use one of: {', '.join(AGGREGATES)}")
+
+    value_column = resolve_column(df, column) if column else None
+    if aggregate != "count":
+        if value_column is None:
+            raise ValueError(f"Aggregate '{aggregate}' needs a column")
+        allowed = NUMERIC_KINDS + ((DATE,) if aggregate in ("min", "max") else ())
+        if kinds.get(value_column) not in allowed:
+            raise ValueError(f"Column '{value_column}' is not numeric; cannot compute {aggregate}")
+
+    matched = df[filter_mask(df, kinds, filters)]
+    label = f"{aggregate}({value_column})" if value_column and aggregate != "count" else "count"
+
+    if not group_by:
+        if aggregate == "count":
+            return f"{label} = {len(matched)}"
+        if matched.empty:
+            return f"{label} = n/a (0 rows)"
+        result = getattr(matched[value_column], aggregate)()
+        return f"{label} = {_format_value(result)} ({len(matched)} rows)"
+
+    group_column = resolve_column(df, group_by)
+    grouped = matched.groupby(group_column, sort=False, dropna=False)
+    counts = grouped.size()
+    values = counts if aggregate == "count" else grouped[value_column].agg(aggregate)
+    values = values.sort_values(ascending=False, kind="stable")
+
+    limit = max(1, int(limit or 20))
+    lines = [f"{group_column} | {label} | rows"]
+    for key, value in values.head(limit).items():
+        lines.append(f"{_format_value(key)} | {_format_value(value)} | {counts[key]}")
+    if len(values) > limit:
+        lines.append(f"... {len(values) - limit} more groups omitted")
+    return "\n".join(lines)
@@ -0,0 +1,99 @@
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+# Amounts use Indian digit grouping ("8,75,630", "2,95,85,228"); rates are "8.45%";
+# dates are either ISO (2024-11-30) or dd-mm-yyyy (22-01-2024)
+AMOUNT_PATTERN = r"-?\d[\d,]*(\.\d+)?"
+PERCENT_PATTERN = r"-?\d+(\.\d+)?%"
+DATE_PATTERN = r"\d{4}-\d{2}-\d{2}|\d{2}-\d{2}-\d{4}"
+
+AMOUNT = "amount"
+PERCENT = "percent"
+DATE = "date"
+NUMBER = "number"
+
+
+def infer_column_kind(series: pd.Series) -> Optional[str]:
+    """Classify a raw column as amount, percent, date, number or None (plain text)"""
+    if pd.api.types.is_numeric_dtype(series):
+        return NUMBER
+
+    values = series.dropna().astype(str).str.strip()
+    if values.empty:
+        return None
+    if values.str.fullmatch(PERCENT_PATTERN).all():
+        return PERCENT
+    if values.str.fullmatch(DATE_PATTERN).all():
+        return DATE
+    if values.str.fullmatch(AMOUNT_PATTERN).all():
+        return AMOUNT
+    return None
+
+
+def parse_amount(series: pd.Series) -> pd.Series:
+    values = pd.to_numeric(series.astype(str).str.replace(",", "", regex=False).str.strip(), errors="coerce")
+    if values.notna().all() and (values == values.round()).all():
+        return values.astype("int64")
+    return values.astype("float64")
+
+
+def parse_percent(series: pd.Series) -> pd.Series:
+    return pd.to_numeric(series.astype(str).str.rstrip("%").str.strip(), errors="coerce").astype("float64")
+
+
+def parse_date(series: pd.Series) -> pd.Series:
+    text = series.astype(str).str.strip()
+    iso = pd.to_datetime(text, format="%Y-%m-%d", errors="coerce")
+    dmy = pd.to_datetime(text, format="%d-%m-%Y", errors="coerce")
+    return iso.fillna(dmy)
+
+
+PARSERS = {
+    AMOUNT: parse_amount,
+    PERCENT: parse_percent,
+    DATE: parse_date,
+}
+
+
+def build_typed_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Parse amount, percent and date columns of a raw accounting table.
+
+    Returns the typed copy (int64/float64/datetime64 columns, text left as-is) and the
+    detected kind of every typed column. The raw frame is kept for display and keyword
+    search, so "8,75,630" still matches as text.
+    """
+    typed = df.copy()
+    kinds: Dict[str, str] = {}
+    for column in df.columns:
+        kind = infer_column_kind(df[column])
+        if kind is None:
+            continue
+        if kind in PARSERS:
+            typed[column] = PARSERS[kind](df[column])
+        kinds[column] = kind
+    return typed, kinds
+
+
+def parse_date_bound(value: str, end: bool = False) -> pd.Timestamp:
+    """
+    Turn a date bound into a timestamp covering the whole period it names.
+
+    "2024-11" or "November 2024" as a lower bound means 2024-11-01 00:00, as an upper
+    bound 2024-11-30 23:59:59; a full date covers that whole day. Full dates are read
+    the way parse_date reads the data, so "05-11-2024" is 5 November, not 11 May.
+    """
+    text = str(value).strip()
+    for date_format in ("%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            period = pd.Period(pd.to_datetime(text, format=date_format), freq="D")
+            break
+        except (ValueError, TypeError):
+            continue
+    else:
+        try:
+            period = pd.Period(text)
+        except Exception:
+            period = pd.Period(pd.Timestamp(text), freq="D")
+    return period.end_time if end else period.start_time
@@ -0,0 +1,220 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.vector_search import get_embedder
+from app.utils.config import (
+    ANSWER_CACHE_EMBEDDER,
+    ANSWER_CACHE_ROUTES,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+)
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+Key = Tuple[str, int, Tuple[str, ...]]
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Words that flip or narrow a question; two questions only share an answer with the same ones
+NEGATIONS = {"not", "no", "never", "none", "nothing", "nobody", "nor", "neither", "without"}
+# Politeness and framing that do not change what is asked
+FILLER = {
+    "a", "an", "the", "i", "me", "my", "we", "our", "you", "your", "is", "are", "am", "was", "were",
+    "be", "do", "does", "did", "can", "could", "would", "will", "please", "kindly", "explain", "tell",
+    "need", "want", "know", "to", "urgently", "hello", "hi", "hey", "thanks", "thank", "just",
+}
+
+
+def question_tokens(text: str) -> List[str]:
+    """
+    Lowercase words of a question without filler, keeping negations ("can't" becomes
+    "not"), question words and numbers, which all change what is asked
+    """
+    tokens = []
+    for word in WORD_PATTERN.findall(text.lower().replace("\u2019", "'")):
+        if word.endswith("n't") or word == "cannot":
+            tokens.append("not")
+        elif word not in FILLER:
+            tokens.append(word.split("'")[0])
+    return tokens
+
+
+def _words(tokens: List[str]) -> Tuple[str, ...]:
+    """The content words of a question as a set, sorted: equal for questions that ask the same"""
+    return tuple(sorted(set(tokens)))
+
+
+def _signature(tokens: List[str]) -> Tuple[str, ...]:
+    """Negations and numbers of a question, which a similar question must share exactly"""
+    return tuple(sorted(t for t in tokens if t in NEGATIONS or any(c.isdigit() for c in t)))
+
+
+class _Entry:
+    __slots__ = ("answer", "signature", "vector", "expires_at")
+
+    def __init__(self, answer: str, signature: Tuple[str, ...], vector: Optional[np.ndarray], expires_at: float):
+        self.answer = answer
+        self.signature = signature
+        self.vector = vector
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """
+    Final answers of earlier turns, served again for the same question.
+
+    Entries are keyed on route, dataset version and the set of content words of the
+    question, so "Can you explain why my bill is high?" and "why is my bill high" share
+    one, while "return it" and "exchange it" never do. With a semantic embedder (see
+    ANSWER_CACHE_EMBEDDER) a question with no exact entry also takes the most similar
+    one of its route and version with the same negations and numbers, when their cosine
+    similarity reaches threshold. Only routes listed in routes are cached; entries expire
+    ttl_seconds after they were stored and are dropped in LRU order beyond max_entries.
+    A new dataset version makes older entries unreachable.
+    """
+
+    def __init__(
+        self,
+        routes: Iterable[str] = ANSWER_CACHE_ROUTES,
+        max_entries: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: float = ANSWER_CACHE_TTL,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        embedder: str = ANSWER_CACHE_EMBEDDER,
+    ):
+        self.routes = set(routes)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._embedder = None
+        if embedder:
+            candidate = get_embedder(embedder)
+            if getattr(candidate, "semantic", False):
+                self._embedder = candidate
+            else:
+                log.warning(f"Embedder '{embedder}' is not semantic; the answer cache matches exact questions only")
+        self._entries: "OrderedDict[Key, _Entry]" = OrderedDict()
+        # Entries by (route, dataset version), for similar matches
+        self._groups: Dict[Tuple[str, int], Dict[Key, _Entry]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def enabled(self, route: Optional[str]) -> bool:
+        return self.max_entries > 0 and route in self.routes
+
+    def _vector(self, tokens: List[str]) -> Optional[np.ndarray]:
+        if self._embedder is None:
+            return None
+        vector = self._embedder.embed_query(" ".join(tokens))
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _drop(self, key: Key):
+        self._entries.pop(key, None)
+        group = self._groups.get(key[:2])
+        if group is not None:
+            group.pop(key, None)
+            if not group:
+                del self._groups[key[:2]]
+
+    def _live(self, key: Key, now: float) -> Optional[_Entry]:
+        """The entry under key unless it expired (then dropped); call with the lock held"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._drop(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, question: str, route: str, version: int) -> Optional[str]:
+        """The cached answer to question on route at dataset version, or None"""
+        if not self.enabled(route):
+            return None
+        tokens = question_tokens(question)
+        if not tokens:
+            return None
+        key = (route, version, _words(tokens))
+        signature = _signature(tokens)
+
+        with self._lock:
+            entry = self._live(key, time.monotonic())
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+            candidates = []
+            if self._embedder is not None:
+                candidates = [
+                    (k, e.vector) for k, e in self._groups.get((route, version), {}).items()
+                    if e.signature == signature and e.vector is not None
+                ]
+
+        # The question is embedded and compared without holding the lock
+        match = None
+        vector = self._vector(tokens) if candidates else None
+        if vector is not None:
+            similarities = np.stack([v for _, v in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                match = candidates[best][0]
+
+        with self._lock:
+            entry = self._live(match, time.monotonic()) if match is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(match)
+            self.hits += 1
+            self.similar_hits += 1
+            return entry.answer
+
+    def put(self, question: str, route: str, version: int, answer: str):
+        if not self.enabled(route) or not answer:
+            return
+        tokens = question_tokens(question)
+        if not tokens:
+            return
+        key = (route, version, _words(tokens))
+        entry = _Entry(answer, _signature(tokens), self._vector(tokens), time.monotonic() + self.ttl_seconds)
+
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._groups.setdefault(key[:2], {})[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "routes": sorted(self.routes),
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "embedder": self._embedder.name if self._embedder is not None else None,
+                "threshold": self.threshold if self._embedder is not None else None,
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+answer_cache = AnswerCache()
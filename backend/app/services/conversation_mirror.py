@@ -0,0 +1,153 @@
+import asyncio
+import random
+from typing import Dict, List, Optional, Tuple
+
+import openai
+
+from app.utils.config import (
+    CONVERSATION_MIRROR,
+    MIRROR_BATCH_SIZE,
+    MIRROR_MAX_RETRIES,
+    MIRROR_QUEUE_SIZE,
+)
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+# Errors worth retrying; anything else (bad request, unknown conversation) is dropped at once
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+# The Conversations API accepts at most 20 items per create call
+MAX_ITEMS_PER_CALL = 20
+
+
+def turn_items(user_text: str, assistant_text: str) -> List[Dict]:
+    """A user/assistant turn as Conversations API input items"""
+    return [
+        {"type": "message", "role": "user", "content": [{"type": "input_text", "text": user_text}]},
+        {"type": "message", "role": "assistant", "content": [{"type": "output_text", "text": assistant_text}]},
+    ]
+
+
+class ConversationMirror:
+    """
+    Write-behind copy of chat turns into their OpenAI conversations.
+
+    Turns are queued (bounded; overflow is dropped and counted) and a background task
+    adds them with conversations.items.create, which stores items without running the
+    model. Queued turns are batched per conversation and retried with exponential
+    backoff on transient errors. Mode "off" disables mirroring entirely.
+    """
+
+    def __init__(
+        self,
+        client: openai.AsyncOpenAI,
+        mode: str = CONVERSATION_MIRROR,
+        max_queue: int = MIRROR_QUEUE_SIZE,
+        batch_size: int = MIRROR_BATCH_SIZE,
+        max_retries: int = MIRROR_MAX_RETRIES,
+        base_delay: float = 0.5,
+    ):
+        self.client = client
+        self.enabled = (mode or "").lower() == "background"
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.metrics = {
+            "enqueued": 0,
+            "mirrored": 0,
+            "batches": 0,
+            "retries": 0,
+            "dropped_overflow": 0,
+            "dropped_failed": 0,
+        }
+
+    def start(self):
+        """Start the background task on the running event loop (no-op when off or running)"""
+        if not self.enabled or (self._worker is not None and not self._worker.done()):
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Give queued turns up to timeout seconds to flush, then stop the task"""
+        if self._worker is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"Conversation mirror stopped with {self._queue.qsize()} turns unsent")
+        self._worker.cancel()
+        self._worker = None
+
+    def submit(self, conversation_id: str, user_text: str, assistant_text: str) -> bool:
+        """Queue a turn for mirroring without waiting; False when off or the queue is full"""
+        if not self.enabled or not conversation_id:
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait((conversation_id, turn_items(user_text, assistant_text)))
+        except asyncio.QueueFull:
+            self.metrics["dropped_overflow"] += 1
+            return False
+        self.metrics["enqueued"] += 1
+        return True
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                for conversation_id, items in self._group(batch):
+                    await self._send(conversation_id, items)
+            except Exception as e:
+                log.error(f"Conversation mirror error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _group(batch: List[Tuple[str, List[Dict]]]) -> List[Tuple[str, List[Dict]]]:
+        """Merge queued turns per conversation (keeping their order) into calls of at most MAX_ITEMS_PER_CALL items"""
+        grouped: Dict[str, List[Dict]] = {}
+        for conversation_id, items in batch:
+            grouped.setdefault(conversation_id, []).extend(items)
+        return [
+            (conversation_id, items[start : start + MAX_ITEMS_PER_CALL])
+            for conversation_id, items in grouped.items()
+            for start in range(0, len(items), MAX_ITEMS_PER_CALL)
+        ]
+
+    async def _send(self, conversation_id: str, items: List[Dict]):
+        turns = len(items) // 2
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.client.conversations.items.create(conversation_id, items=items)
+                self.metrics["mirrored"] += turns
+                self.metrics["batches"] += 1
+                return
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    log.warning(f"Giving up mirroring {turns} turns to {conversation_id}: {e}")
+                    break
+                self.metrics["retries"] += 1
+                await asyncio.sleep(self.base_delay * (2 ** attempt) * (1 + random.random()))
+            except Exception as e:
+                log.warning(f"Could not mirror {turns} turns to {conversation_id}: {e}")
+                break
+        self.metrics["dropped_failed"] += turns
+
+    def stats(self) -> Dict:
+        return {
+            "mode": "background" if self.enabled else "off",
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            **self.metrics,
+        }
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from app.utils.config import CSV_BATCH_SIZE, IMPORT_WORKERS
+from app.utils.custom_logging import custom_logger
+from app.services.datasets import ACCOUNTING_FILES, SUPPORT_FILE
+from app.services.mongodb_data_service import mongodb_data_service
+
+log = custom_logger()
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "../../data")
+
+
+def source_files(data_dir: str = DATA_DIR) -> Dict[str, str]:
+    """Dataset name -> CSV path for the seven files the backend serves"""
+    files = {name: os.path.join(data_dir, "accounting", name) for name in ACCOUNTING_FILES}
+    files[SUPPORT_FILE] = os.path.join(data_dir, "support", SUPPORT_FILE)
+    return files
+
+
+def file_checksum(path: str, size: Optional[int] = None) -> str:
+    """sha256 of a file, or of just its first size bytes"""
+    digest = hashlib.sha256()
+    remaining = os.path.getsize(path) if size is None else size
+    with open(path, "rb") as f:
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _consistent_chunks(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    pandas infers dtypes per chunk; keep columns that are text in the first chunk as text
+    in later ones (e.g. IDs that happen to be all digits in one batch)
+    """
+    text_columns = None
+    for chunk in chunks:
+        if text_columns is None:
+            text_columns = [c for c in chunk.columns if chunk[c].dtype == object]
+        for c in text_columns:
+            if chunk[c].dtype != object:
+                chunk[c] = chunk[c].astype(str).where(chunk[c].notna(), None)
+        yield chunk
+
+
+def _appended_bytes(path: str, header: Optional[Dict], size: int) -> bool:
+    """Whether the file is the stored source with rows added at the end (a nightly ledger drop)"""
+    if not header or header.get("layout") != "chunked":
+        return False
+    stored_size = header.get("source_size")
+    if not stored_size or size <= stored_size or not header.get("checksum"):
+        return False
+    return file_checksum(path, stored_size) == header["checksum"]
+
+
+def import_file(file_name: str, path: str, force: bool = False) -> Dict:
+    """
+    Stream one CSV into MongoDB in CSV_BATCH_SIZE batches.
+
+    Unchanged files (same sha256 as the stored import) are skipped; files that only grew
+    at the end have just the new bytes parsed and appended; anything else is imported
+    as a new version. Returns a summary with the rows written and rows/sec.
+    """
+    started = time.perf_counter()
+    result = {"file_name": file_name, "status": "failed", "rows": 0}
+    try:
+        size = os.path.getsize(path)
+        checksum = file_checksum(path)
+        header = None if force else mongodb_data_service.get_csv_header(file_name)
+
+        if header and header.get("layout") == "chunked" and header.get("checksum") == checksum:
+            result["status"] = "skipped"
+        elif _appended_bytes(path, header, size):
+            with open(path, "rb") as f:
+                f.seek(header["source_size"])
+                chunks = pd.read_csv(f, header=None, names=header["columns"], chunksize=CSV_BATCH_SIZE)
+                result["rows"] = mongodb_data_service.append_csv_chunks(
+                    file_name, _consistent_chunks(chunks), checksum=checksum, source_size=size
+                )
+            result["status"] = "appended"
+        else:
+            columns = list(pd.read_csv(path, nrows=0).columns)
+            chunks = pd.read_csv(path, chunksize=CSV_BATCH_SIZE)
+            result["rows"] = mongodb_data_service.save_csv_chunks(
+                file_name, columns, _consistent_chunks(chunks), checksum=checksum, source_size=size
+            )
+            result["status"] = "imported"
+    except Exception as e:
+        log.error(f"Error importing {file_name}: {e}")
+        result["error"] = str(e)
+
+    seconds = time.perf_counter() - started
+    result["seconds"] = round(seconds, 3)
+    result["rows_per_sec"] = round(result["rows"] / seconds) if seconds > 0 else 0
+    log.info(
+        f"{file_name}: {result['status']}, {result['rows']} rows in {seconds:.2f}s ({result['rows_per_sec']} rows/sec)"
+    )
+    return result
+
+
+def import_all(files: Optional[Dict[str, str]] = None, force: bool = False, workers: int = IMPORT_WORKERS) -> List[Dict]:
+    """Import every dataset concurrently on a worker pool; summaries come back in input order"""
+    files = files if files is not None else source_files()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(files) or 1))) as pool:
+        return list(pool.map(lambda item: import_file(item[0], item[1], force), files.items()))
@@ -123,19 +123,66 @@
 # data_manager.load_accounting_data()
 # data_manager.load_support_data()
 
+import json
 import os
+import threading
+import numpy as np
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from app.utils.config import (
+    DATASET_POLL_INTERVAL,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    SUPPORT_SEARCH_MODE,
+    TOOL_RESULT_MAX_ROWS,
+    TOOL_RESULT_MAX_TOKENS,
+)
 from app.utils.custom_logging import custom_logger
 from app.services.mongodb_data_service import mongodb_data_service
+from app.services.accounting_query import run_aggregate
+from app.services.accounting_schema import AMOUNT, DATE, NUMBER, PERCENT, parse_date_bound
+from app.services.datasets import ACCOUNTING_FILES, SUPPORT_FILE, AccountingTable, DatasetSnapshot, SupportTable
+from app.services.result_cache import ResultCache
+from app.services.snapshot_store import SnapshotStore
+from app.services.result_renderer import RenderBudget
+from app.services.vector_search import VectorIndex, get_embedder
 
 log = custom_logger()
 
 class DataManager:
     def __init__(self):
-        self.accounting_data: Dict[str, pd.DataFrame] = {}
-        self.support_data: pd.DataFrame = None
+        # Every search reads one DatasetSnapshot; loads and reloads publish a new one in a
+        # single assignment, so searches never block on (or see half of) a reload
+        self.datasets = DatasetSnapshot(0, {}, None)
+        self.support_vectors: Optional[VectorIndex] = None
+        self.search_cache = ResultCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+        self.snapshots = SnapshotStore()
+        self._reload_lock = threading.Lock()
+        self._stop_watching = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
         # self.data_dir = os.path.join(os.path.dirname(__file__), "../../data")
+
+    @property
+    def version(self) -> int:
+        """Bumped on every (re)load; part of every search cache key so stale results are never served"""
+        return self.datasets.version
+
+    @property
+    def accounting_data(self) -> Dict[str, pd.DataFrame]:
+        return {name: table.df for name, table in self.datasets.accounting.items()}
+
+    @property
+    def support_data(self) -> Optional[pd.DataFrame]:
+        support = self.datasets.support
+        return support.df if support is not None else None
+
+    def _publish(self, accounting: Dict[str, AccountingTable] = None, support: SupportTable = None):
+        current = self.datasets
+        self.datasets = DatasetSnapshot(
+            current.version + 1,
+            accounting if accounting is not None else current.accounting,
+            support if support is not None else current.support,
+        )
     
     # def load_accounting_data(self):
     #     try:
@@ -149,22 +196,38 @@ class DataManager:
     #                 log.info(f"Loaded {file}: {len(self.accounting_data[file])} rows")
     #     except Exception as e:
     #         log.error(f"Error loading accounting data: {e}")
+    def _load_dataset(self, file_name: str) -> Tuple[Optional[pd.DataFrame], Optional[Dict]]:
+        """
+        Load a dataset from its local snapshot when MongoDB reports it unchanged, otherwise
+        fetch it from MongoDB and refresh the snapshot. With MongoDB down, the last
+        snapshot is served as-is. Returns (df, stamp it was loaded at).
+        """
+        offline = mongodb_data_service.csv_collection is None
+        stamp = None if offline else mongodb_data_service.get_csv_metadata(file_name)
+        if offline or stamp is not None:
+            df = self.snapshots.load(file_name, stamp, allow_stale=offline)
+            if df is not None:
+                if offline:
+                    log.warning(f"MongoDB unavailable, serving last snapshot of {file_name}")
+                log.info(f"Loaded {file_name} from local snapshot: {len(df)} rows")
+                return df, stamp
+
+        df = mongodb_data_service.load_csv_data(file_name)
+        if df is not None:
+            log.info(f"Loaded {file_name} from MongoDB: {len(df)} rows")
+            if stamp is not None:
+                self.snapshots.save(file_name, df, stamp)
+        return df, stamp
+
     def load_accounting_data(self):
-        files = [
-            "Asset.csv",
-            "COA_final.csv",
-            "debt_final.csv",
-            "Human_Capital_final.csv",
-            "profit&Loss_final.csv",
-            "transaction.csv",
-        ]
-
-        for file in files:
-            df = mongodb_data_service.load_csv_data(file)
+        tables = {}
+        for file in ACCOUNTING_FILES:
+            df, stamp = self._load_dataset(file)
             if df is None:
                 raise RuntimeError(f"Accounting data missing in MongoDB: {file}")
-            self.accounting_data[file] = df
-            log.info(f"Loaded {file} from MongoDB: {len(df)} rows")
+            tables[file] = AccountingTable(file, df, stamp)
+        with self._reload_lock:
+            self._publish(accounting=tables)
 
     
     # def load_support_data(self):
@@ -176,133 +239,334 @@ class DataManager:
     #     except Exception as e:
     #         log.error(f"Error loading support data: {e}")
     def load_support_data(self):
-        df = mongodb_data_service.load_csv_data("Smart_Metering_Support_Dataset.csv")
+        df, stamp = self._load_dataset(SUPPORT_FILE)
         if df is None:
             raise RuntimeError("Support data missing in MongoDB")
-        self.support_data = df
-        log.info(f"Loaded support data from MongoDB: {len(df)} rows")
+        support = SupportTable(df, stamp)
+        with self._reload_lock:
+            self._publish(support=support)
+
+    def _refresh_accounting_table(self, table: AccountingTable) -> Optional[AccountingTable]:
+        """
+        A new table when MongoDB holds newer data than table, else None. Rows appended to
+        the same version are fetched alone and indexed incrementally; anything else (a
+        re-import, a shrink) rebuilds the table.
+        """
+        stamp = mongodb_data_service.get_csv_metadata(table.name)
+        if stamp is None or stamp == table.stamp:
+            return None
+
+        loaded = table.stamp or {}
+        if (
+            stamp.get("version")
+            and stamp["version"] == loaded.get("version")
+            and len(table.df) == loaded.get("row_count")
+            and stamp["row_count"] > len(table.df)
+        ):
+            rows = mongodb_data_service.load_csv_rows(table.name, stamp["version"], len(table.df), stamp["row_count"])
+            if rows is not None:
+                updated = table.appended(rows, stamp)
+                self.snapshots.save(table.name, updated.df, stamp)
+                log.info(f"Appended {len(rows)} new rows to {table.name}")
+                return updated
+
+        df, stamp = self._load_dataset(table.name)
+        if df is None:
+            return None
+        log.info(f"Reloaded {table.name}: {len(df)} rows")
+        return AccountingTable(table.name, df, stamp)
+
+    def refresh(self) -> bool:
+        """Pick up datasets changed in MongoDB since they were loaded; True when a new snapshot was published"""
+        if mongodb_data_service.csv_collection is None:
+            return False
+
+        with self._reload_lock:
+            current = self.datasets
+            accounting = dict(current.accounting)
+            support = None
+            for name, table in current.accounting.items():
+                try:
+                    updated = self._refresh_accounting_table(table)
+                except Exception as e:
+                    log.error(f"Error refreshing {name}: {e}")
+                    continue
+                if updated is not None:
+                    accounting[name] = updated
+
+            if current.support is not None:
+                stamp = mongodb_data_service.get_csv_metadata(SUPPORT_FILE)
+                if stamp is not None and stamp != current.support.stamp:
+                    df, stamp = self._load_dataset(SUPPORT_FILE)
+                    if df is not None:
+                        support = SupportTable(df, stamp)
+                        log.info(f"Reloaded {SUPPORT_FILE}: {len(df)} rows")
+
+            changed = support is not None or any(accounting[n] is not t for n, t in current.accounting.items())
+            if changed:
+                self._publish(accounting, support)
+            return changed
+
+    def start_watcher(self, interval: float = DATASET_POLL_INTERVAL):
+        """Poll MongoDB for dataset changes every interval seconds on a daemon thread (0 disables)"""
+        if interval <= 0 or self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    log.error(f"Error refreshing datasets: {e}")
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=watch, name="dataset-watcher", daemon=True)
+        self._watcher.start()
+        log.info(f"Watching MongoDB datasets for changes every {interval:g}s")
+
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join(timeout=5)
+        self._watcher = None
 
     
-    def search_accounting(self, query: str, file_name: str = None) -> str:
+    def _cached(self, tool: str, args: Dict, compute):
+        """
+        Serve a tool result from the search cache, keyed on tool, dataset version and
+        normalized args. compute gets the snapshot the version was taken from.
+        """
+        datasets = self.datasets
+        key = (tool, datasets.version, json.dumps(args, sort_keys=True, default=str))
+        return self.search_cache.get_or_compute(
+            key, lambda: compute(datasets), cacheable=lambda r: not str(r).startswith("Error")
+        )
+
+    def cache_stats(self) -> Dict:
+        return {"version": self.version, **self.search_cache.stats()}
+
+    def resolve_file_name(self, file_name: Optional[str], datasets: DatasetSnapshot = None) -> Optional[str]:
+        """Match a file name loosely (case-insensitive, ".csv" optional) against the loaded tables"""
+        if not file_name:
+            return None
+        wanted = file_name.strip().lower()
+        for name in (datasets or self.datasets).accounting:
+            if wanted in (name.lower(), name.lower()[: -len(".csv")]):
+                return name
+        return None
+
+    def _range_mask(self, table: AccountingTable, kinds: tuple, column: Optional[str], low, high) -> np.ndarray:
+        """Rows where any column of the given kinds (or just the named column) lies within [low, high]"""
+        typed = table.typed
+        if column:
+            columns = [c for c, k in table.kinds.items() if c.lower() == column.strip().lower() and k in kinds + (NUMBER, PERCENT)]
+        else:
+            columns = [c for c, k in table.kinds.items() if k in kinds]
+
+        mask = np.zeros(len(typed), dtype=bool)
+        for c in columns:
+            values = typed[c]
+            column_mask = values.notna().to_numpy()
+            if low is not None:
+                column_mask &= (values >= low).to_numpy()
+            if high is not None:
+                column_mask &= (values <= high).to_numpy()
+            mask |= column_mask
+        return mask
+
+    def _match_rows(self, table: AccountingTable, keywords: List[str], filters: Optional[Dict] = None) -> np.ndarray:
+        """
+        Ids of rows of an accounting table containing any of the keywords (all rows when
+        there are none), narrowed by the amount/date range filters if given.
+        """
+        if keywords:
+            rows = table.index.match_any(keywords)
+        else:
+            rows = np.arange(len(table.df))
+
+        if filters and (filters["min_amount"] is not None or filters["max_amount"] is not None):
+            mask = self._range_mask(table, (AMOUNT,), filters["amount_column"], filters["min_amount"], filters["max_amount"])
+            rows = rows[mask[rows]]
+        if filters and (filters["date_from"] is not None or filters["date_to"] is not None):
+            mask = self._range_mask(table, (DATE,), filters["date_column"], filters["date_from"], filters["date_to"])
+            rows = rows[mask[rows]]
+
+        return rows
+
+    def _rank_rows(self, table: AccountingTable, rows: np.ndarray, keywords: List[str]):
+        """Order matched rows by how many distinct keywords they contain (stable); returns (rows, best hit count)"""
+        if len(rows) == 0:
+            return rows, 0
+        if len(keywords) < 2:
+            return rows, len(keywords)
+        texts = table.index.texts
+        hits = np.fromiter((sum(kw in texts[i] for kw in keywords) for i in rows), dtype=np.int64, count=len(rows))
+        order = np.argsort(-hits, kind="stable")
+        return rows[order], int(hits[order[0]])
+
+    def search_accounting(self, query: str, file_name: str = None, **options) -> str:
+        query = " ".join(str(query or "").lower().split())
+        return self._cached(
+            "search_accounting",
+            {"query": query, "file_name": file_name, **options},
+            lambda datasets: self._search_accounting(datasets, query, file_name, **options),
+        )
+
+    def _search_accounting(
+        self,
+        datasets: DatasetSnapshot,
+        query: str,
+        file_name: str = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        amount_column: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        date_column: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+        max_rows: Optional[int] = None,
+    ) -> str:
         try:
+            query = query or ""
             # Split query into keywords for better matching (keep words longer than 2 chars)
             keywords = [q.strip() for q in query.lower().split() if len(q.strip()) > 2]
-            if not keywords:
+            if not keywords and query.strip():
                 keywords = [query.lower().strip()]
+
+            try:
+                filters = {
+                    "min_amount": min_amount,
+                    "max_amount": max_amount,
+                    "amount_column": amount_column,
+                    "date_from": parse_date_bound(date_from) if date_from else None,
+                    "date_to": parse_date_bound(date_to, end=True) if date_to else None,
+                    "date_column": date_column,
+                }
+            except Exception:
+                return f"Could not parse date range '{date_from}' - '{date_to}'. Use YYYY-MM-DD or YYYY-MM."
             
-            # Helper function to check if row matches keywords
-            def row_matches_keywords(row, search_keywords):
-                row_text = ' '.join([str(v).lower() for v in row.values if pd.notna(v)])
-                return any(kw in row_text for kw in search_keywords)
-            
-            if file_name and file_name in self.accounting_data:
-                df = self.accounting_data[file_name]
-                mask = df.apply(lambda row: row_matches_keywords(row, keywords), axis=1)
-                results = df[mask]
-                print("Search accounting result:",results)
-                if not results.empty:
-                    return f"\n{file_name}:\n{results.to_string(index=False)}\n"
+            budget = RenderBudget(min(max_rows or TOOL_RESULT_MAX_ROWS, TOOL_RESULT_MAX_ROWS), TOOL_RESULT_MAX_TOKENS)
+
+            file_name = self.resolve_file_name(file_name, datasets)
+            if file_name:
+                table = datasets.accounting[file_name]
+                rows, _ = self._rank_rows(table, self._match_rows(table, keywords, filters), keywords)
+                if len(rows):
+                    return table.renderer.render(file_name, rows, budget, columns)
                 return f"No matching records found in {file_name}."
             
-            # Search across all files
-            all_results = []
-            for name, df in self.accounting_data.items():
-                mask = df.apply(lambda row: row_matches_keywords(row, keywords), axis=1)
-                results = df[mask]
-                if not results.empty:
-                    all_results.append(f"\n{name}:\n{results.to_string(index=False)}\n")
+            # Search across all files. A row matches when it contains any keyword, so a
+            # miss here is also a miss for the first keyword alone - no second pass needed.
+            matches = []
+            for name, table in datasets.accounting.items():
+                rows, best = self._rank_rows(table, self._match_rows(table, keywords, filters), keywords)
+                if len(rows):
+                    matches.append((best, name, rows))
             
-            if all_results:
-                return "\n".join(all_results)
-            print("All result before keyword search:",all_results)
-            # If no results with all keywords, try with first keyword only
-            if len(keywords) > 1:
-                for name, df in self.accounting_data.items():
-                    mask = df.apply(lambda row: row_matches_keywords(row, [keywords[0]]), axis=1)
-                    results = df[mask]
-                    if not results.empty:
-                        all_results.append(f"\n{name}:\n{results.to_string(index=False)}\n")
-                if all_results:
-                    return "\n".join(all_results)
-            print("All result after keyword search:",all_results)
+            if matches:
+                # Files whose rows hit the most keywords get the output budget first
+                matches.sort(key=lambda m: -m[0])
+                return "\n".join(
+                    datasets.accounting[name].renderer.render(name, rows, budget, columns) for _, name, rows in matches
+                )
             
             return "No matching records found. Try searching with different keywords like employee name, department, amount, or date."
         except Exception as e:
             log.error(f"Error searching accounting data: {e}")
             return f"Error: {str(e)}"
     
-    def search_support(self, query: str) -> str:
+    def aggregate_accounting(self, file_name: str, **spec) -> str:
+        return self._cached(
+            "aggregate_accounting",
+            {"file_name": file_name, **spec},
+            lambda datasets: self._aggregate_accounting(datasets, file_name, **spec),
+        )
+
+    def _aggregate_accounting(
+        self,
+        datasets: DatasetSnapshot,
+        file_name: str,
+        filters: Optional[List[Dict]] = None,
+        group_by: Optional[str] = None,
+        aggregate: str = "count",
+        column: Optional[str] = None,
+        limit: int = 20,
+    ) -> str:
         try:
-            if self.support_data is None:
-                return "Support data not loaded."
+            resolved = self.resolve_file_name(file_name, datasets)
+            if resolved is None:
+                return f"Unknown file '{file_name}'. Available: {', '.join(datasets.accounting)}"
+            table = datasets.accounting[resolved]
+            result = run_aggregate(
+                table.typed,
+                table.kinds,
+                filters=filters,
+                group_by=group_by,
+                aggregate=aggregate,
+                column=column,
+                limit=limit,
+            )
+            return f"{resolved}:\n{result}"
+        except ValueError as e:
+            return f"Invalid query: {e}"
+        except Exception as e:
+            log.error(f"Error aggregating accounting data: {e}")
+            return f"Error: {str(e)}"
 
-            df = self.support_data.copy()
+    def _search_support_vector(self, query: str) -> str:
+        if self.support_vectors is None:
+            self.support_vectors = VectorIndex(get_embedder()).load()
 
-            if df.empty:
-                return "Support data is empty."
+        hits = self.support_vectors.search(query, 3)
+        if not hits:
+            return "No matching support records found."
+
+        chunks: List[str] = []
+        for chunk_index, (doc_id, score, text) in enumerate(hits, start=1):
+            chunks.append(f"\n=== Chunk {chunk_index} ({doc_id}, cosine similarity: {score:.2f}) ===\n{text}")
+        return "\n".join(chunks)
 
-            # Normalize text for simple semantic + keyword style matching
-            def normalize(text: str) -> str:
-                if pd.isna(text):
-                    return ""
-                return str(text).lower()
+    def search_support(self, query: str, mode: Optional[str] = None) -> str:
+        query = " ".join(str(query or "").split())
+        mode = (mode or SUPPORT_SEARCH_MODE).lower()
+        return self._cached(
+            "search_support",
+            {"query": query.lower(), "mode": mode},
+            lambda datasets: self._search_support(datasets.support, query, mode),
+        )
 
-            query_norm = normalize(query)
-            if not query_norm.strip():
+    def _search_support(self, support: Optional[SupportTable], query: str, mode: str) -> str:
+        try:
+            if not str(query).strip():
                 return "No matching support records found."
 
-            # Build keyword list (words longer than 2 chars)
-            keywords = [w for w in query_norm.split() if len(w) > 2]
-            if not keywords:
-                keywords = [query_norm.strip()]
+            if mode == "vector":
+                return self._search_support_vector(query)
+            if mode != "bm25":
+                return f"Unknown support search mode '{mode}'. Use 'bm25' or 'vector'."
 
-            def score_row(row) -> float:
-                """Combined keyword + simple semantic-style overlap score for a single row."""
-                text = normalize(row.get("Customer_Query", "")) + " " + normalize(
-                    row.get("Evidence_Based_Answer", "")
-                )
-                if not text:
-                    return 0.0
-
-                # Keyword score: count of distinct keywords found
-                keyword_score = sum(1 for kw in keywords if kw in text)
-
-                # Simple semantic-style score: token overlap ratio
-                row_tokens = set(t for t in text.split() if len(t) > 2)
-                query_tokens = set(keywords)
-                if not row_tokens or not query_tokens:
-                    semantic_score = 0.0
-                else:
-                    intersection = len(row_tokens & query_tokens)
-                    union = len(row_tokens | query_tokens)
-                    semantic_score = intersection / union if union > 0 else 0.0
-
-                # Weight keyword hits a bit more, but include semantic overlap
-                return keyword_score + semantic_score
-
-            df["__score"] = df.apply(score_row, axis=1)
-
-            # Keep only rows with some match signal
-            matched = df[df["__score"] > 0].sort_values("__score", ascending=False)
-            if matched.empty:
+            if support is None:
+                return "Support data not loaded."
+
+            if support.df.empty:
+                return "Support data is empty."
+
+            # BM25 over Customer_Query + Evidence_Based_Answer; top 3 chunks of up to 5 rows
+            chunk_size = 5
+            row_ids, scores = support.index.top_k(query, 3 * chunk_size)
+            if len(row_ids) == 0:
                 return "No matching support records found."
 
-            # Take top 3 chunks; 1 chunk = up to 5 rows
-            top_rows = matched.head(15)[["Customer_Query", "Evidence_Based_Answer", "Category", "__score"]]
+            top_rows = support.df.iloc[row_ids][["Customer_Query", "Evidence_Based_Answer", "Category"]]
 
             chunks: List[str] = []
-            chunk_size = 5
             for i in range(0, len(top_rows), chunk_size):
-                chunk_df = top_rows.iloc[i : i + chunk_size].copy()
-                # Hide internal score from final table but keep it in text title
-                max_score = chunk_df["__score"].max()
-                display_df = chunk_df.drop(columns=["__score"])
+                # Rows are sorted by score, so the first row carries the chunk's best score
                 chunk_index = len(chunks) + 1
-                chunk_text = f"\n=== Chunk {chunk_index} (approx. relevance score: {max_score:.2f}) ===\n"
-                chunk_text += display_df.to_string(index=False)
+                chunk_text = f"\n=== Chunk {chunk_index} (approx. relevance score: {scores[i]:.2f}) ===\n"
+                chunk_text += top_rows.iloc[i : i + chunk_size].to_string(index=False)
                 chunks.append(chunk_text)
-                if len(chunks) >= 3:
-                    break
 
             return "\n".join(chunks)
         except Exception as e:
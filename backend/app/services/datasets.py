@@ -0,0 +1,88 @@
+from typing import Dict, Optional
+
+import pandas as pd
+
+from app.services.accounting_schema import PARSERS, build_typed_frame
+from app.services.result_renderer import TableRenderer
+from app.services.search_index import BM25Index, KeywordIndex, row_texts
+
+ACCOUNTING_FILES = [
+    "Asset.csv",
+    "COA_final.csv",
+    "debt_final.csv",
+    "Human_Capital_final.csv",
+    "profit&Loss_final.csv",
+    "transaction.csv",
+]
+SUPPORT_FILE = "Smart_Metering_Support_Dataset.csv"
+
+
+class AccountingTable:
+    """
+    One accounting file and everything derived from it: keyword index, typed copy and
+    pre-rendered rows. Never mutated once built; appending rows produces a new table.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        df: pd.DataFrame,
+        stamp: Optional[Dict] = None,
+        index: KeywordIndex = None,
+        typed: pd.DataFrame = None,
+        kinds: Dict[str, str] = None,
+        renderer: TableRenderer = None,
+    ):
+        self.name = name
+        self.df = df
+        # Freshness stamp (updated_at, row_count, version) the data was loaded at
+        self.stamp = stamp
+        self.index = index if index is not None else KeywordIndex.from_frame(df)
+        if typed is None:
+            typed, kinds = build_typed_frame(df)
+        self.typed = typed
+        self.kinds = kinds
+        self.renderer = renderer if renderer is not None else TableRenderer(df)
+
+    def appended(self, rows: pd.DataFrame, stamp: Optional[Dict]) -> "AccountingTable":
+        """A new table with rows appended, extending the derived structures instead of rebuilding them"""
+        rows = rows.reset_index(drop=True)[list(self.df.columns)]
+        typed_rows = rows.copy()
+        for column, kind in self.kinds.items():
+            if kind in PARSERS:
+                typed_rows[column] = PARSERS[kind](rows[column])
+
+        return AccountingTable(
+            self.name,
+            pd.concat([self.df, rows], ignore_index=True),
+            stamp,
+            index=self.index.extended(row_texts(rows)),
+            typed=pd.concat([self.typed, typed_rows], ignore_index=True),
+            kinds=self.kinds,
+            renderer=self.renderer.extended(rows),
+        )
+
+
+class SupportTable:
+    """The support knowledge base and its BM25 index over Customer_Query + Evidence_Based_Answer"""
+
+    def __init__(self, df: pd.DataFrame, stamp: Optional[Dict] = None):
+        self.df = df
+        self.stamp = stamp
+        self.index = BM25Index(
+            (df["Customer_Query"].fillna("").astype(str) + " " + df["Evidence_Based_Answer"].fillna("").astype(str)).tolist()
+        )
+
+
+class DatasetSnapshot:
+    """
+    Immutable view of every dataset at one version.
+
+    DataManager swaps whole snapshots, and a search reads the snapshot it started with
+    from start to finish, so a reload never shows it a mix of old and new data.
+    """
+
+    def __init__(self, version: int, accounting: Dict[str, AccountingTable], support: Optional[SupportTable]):
+        self.version = version
+        self.accounting = accounting
+        self.support = support
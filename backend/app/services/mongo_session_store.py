@@ -0,0 +1,271 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.utils.custom_logging import custom_logger
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.services.mongodb_service import mongodb_service
+from app.services.session_store import SessionConflict, make_title
+
+log = custom_logger()
+
+SESSION_FIELDS = {
+    "_id": 0,
+    "session_id": 1,
+    "conversation_id": 1,
+    "title": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "message_count": 1,
+    "version": 1,
+    "summary": 1,
+    "summary_upto": 1,
+}
+# Listings leave out what only a single session's view needs
+LISTING_FIELDS = {field: 1 for field in SESSION_FIELDS if field not in ("conversation_id", "summary", "summary_upto")}
+LISTING_FIELDS["_id"] = 0
+# Upper bound for $slice when reading a session's messages from an index on
+MAX_MESSAGES = 2**31 - 1
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _session_info(doc: Dict) -> Dict:
+    return {
+        "session_id": doc.get("session_id", ""),
+        "conversation_id": doc.get("conversation_id"),
+        "title": doc.get("title") or "New Chat",
+        "created_at": _iso(doc.get("created_at")),
+        "updated_at": _iso(doc.get("updated_at")),
+        "message_count": doc.get("message_count", 0),
+        "version": doc.get("version", 0),
+        "summary": doc.get("summary"),
+        "summary_upto": doc.get("summary_upto", 0),
+    }
+
+
+class MongoSessionStore:
+    """
+    SessionStore backed by the MongoDB "chats" collection, for deployments where workers
+    on several hosts share sessions.
+
+    Same interface and semantics as SessionStore: one document per session, turns pushed
+    onto its messages array, and a per-session version that every write bumps. Writes
+    that expect a version filter on it, so a concurrent writer surfaces as SessionConflict.
+    """
+
+    def __init__(self):
+        if mongodb_service.chats is None:
+            raise RuntimeError("MongoDB not available for session storage")
+        self.chats = mongodb_service.chats
+        self._ensure_indexes()
+
+    def _ensure_indexes(self):
+        try:
+            self.chats.create_index("session_id", unique=True)
+            self.chats.create_index([("updated_at", -1), ("session_id", -1)])
+            # Chats saved before message_count existed get it once
+            self.chats.update_many(
+                {"message_count": {"$exists": False}},
+                [{"$set": {"message_count": {"$size": {"$ifNull": ["$messages", []]}}}}],
+            )
+        except Exception as e:
+            log.warning(f"Could not prepare chats collection: {e}")
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        doc = self.chats.find_one({"session_id": session_id}, SESSION_FIELDS)
+        return _session_info(doc) if doc else None
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        query = {}
+        after = decode_cursor(cursor)
+        if after:
+            updated_at = datetime.fromisoformat(after[0])
+            query = {
+                "$or": [
+                    {"updated_at": {"$lt": updated_at}},
+                    {"updated_at": updated_at, "session_id": {"$lt": after[1]}},
+                ]
+            }
+        docs = self.chats.find(
+            query,
+            LISTING_FIELDS,
+            sort=[("updated_at", -1), ("session_id", -1)],
+            limit=limit + 1 if limit else 0,
+        )
+        sessions = [_session_info(doc) for doc in docs]
+        for session in sessions:
+            for field in ("conversation_id", "summary", "summary_upto"):
+                del session[field]
+        if limit and len(sessions) > limit:
+            sessions = sessions[:limit]
+            return sessions, encode_cursor(sessions[-1]["updated_at"], sessions[-1]["session_id"])
+        return sessions, None
+
+    def get_messages(self, session_id: str) -> List[Dict]:
+        return self.get_history(session_id)[0]
+
+    def get_version(self, session_id: str) -> int:
+        doc = self.chats.find_one({"session_id": session_id}, {"_id": 0, "version": 1})
+        return doc.get("version", 0) if doc else 0
+
+    def get_history(self, session_id: str, start: int = 0) -> Tuple[List[Dict], int]:
+        window = {"$slice": [start, MAX_MESSAGES]} if start else 1
+        doc = self.chats.find_one({"session_id": session_id}, {"_id": 0, "messages": window, "version": 1})
+        if doc is None:
+            return [], 0
+        return doc.get("messages") or [], doc.get("version", 0)
+
+    def get_messages_page(self, session_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        before = decode_cursor(cursor)
+        if not limit and not before:
+            return self.get_messages(session_id), None
+
+        if before:
+            end = before[0]
+            start = max(0, end - limit) if limit else 0
+            if end <= 0:
+                return [], None
+            window = {"$slice": [start, end - start]}
+        else:
+            window = {"$slice": -limit}
+        doc = self.chats.find_one({"session_id": session_id}, {"_id": 0, "message_count": 1, "messages": window})
+        if doc is None:
+            return [], None
+
+        messages = doc.get("messages") or []
+        if not before:
+            start = doc.get("message_count", len(messages)) - len(messages)
+        return messages, encode_cursor(start) if limit and start > 0 else None
+
+    def create_session(self, session_id: str, conversation_id: Optional[str] = None, title: Optional[str] = None):
+        now = datetime.utcnow()
+        self.chats.update_one(
+            {"session_id": session_id},
+            {
+                "$set": {
+                    "conversation_id": conversation_id,
+                    "title": title or "New Chat",
+                    "created_at": now,
+                    "updated_at": now,
+                    "messages": [],
+                    "message_count": 0,
+                    "summary": None,
+                    "summary_upto": 0,
+                },
+                "$inc": {"version": 1},
+            },
+            upsert=True,
+        )
+
+    def save_messages(self, session_id: str, messages: List[Dict], expected_version: Optional[int] = None, start: int = 0) -> Dict:
+        now = datetime.utcnow()
+        doc = self.chats.find_one(
+            {"session_id": session_id},
+            {"_id": 0, "message_count": 1, "version": 1, "title": 1, "messages": {"$slice": -1}},
+        )
+        version = doc.get("version", 0) if doc else 0
+        if expected_version is not None and version != expected_version:
+            raise SessionConflict(f"Session {session_id} changed since version {expected_version}")
+
+        stored = doc.get("message_count", 0) if doc else 0
+        if stored < start:
+            raise SessionConflict(f"Session {session_id} has {stored} messages, fewer than {start}")
+
+        title = doc.get("title") if doc else None
+        if not title or title == "New Chat":
+            first_user = next((m for m in messages if m.get("role") == "user"), None)
+            title = make_title(first_user.get("content", "")) if first_user else "New Chat"
+
+        if doc is None:
+            doc = {
+                "session_id": session_id,
+                "title": title,
+                "created_at": now,
+                "updated_at": now,
+                "messages": messages,
+                "message_count": len(messages),
+                "version": 1,
+            }
+            try:
+                self.chats.insert_one(doc)
+            except DuplicateKeyError:
+                raise SessionConflict(f"Session {session_id} was created concurrently")
+            return _session_info(doc)
+
+        total = start + len(messages)
+        last = (doc.get("messages") or [None])[-1]
+        if stored <= total and (stored == start or last == messages[stored - 1 - start]):
+            update = {
+                "$push": {"messages": {"$each": messages[stored - start:]}},
+                "$inc": {"message_count": total - stored, "version": 1},
+                "$set": {"updated_at": now, "title": title},
+            }
+        elif start == 0:
+            # The summary described the replaced messages
+            update = {
+                "$set": {"messages": messages, "message_count": total, "summary": None, "summary_upto": 0, "updated_at": now, "title": title},
+                "$inc": {"version": 1},
+            }
+        else:
+            # Replace from start on, keeping the earlier messages and any summary of them only
+            covers_replaced = {"$gt": [{"$ifNull": ["$summary_upto", 0]}, start]}
+            update = [
+                {
+                    "$set": {
+                        "messages": {"$concatArrays": [{"$slice": ["$messages", start]}, {"$literal": messages}]},
+                        "message_count": total,
+                        "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+                        "summary": {"$cond": [covers_replaced, None, "$summary"]},
+                        "summary_upto": {"$cond": [covers_replaced, 0, "$summary_upto"]},
+                        "updated_at": now,
+                        "title": title,
+                    }
+                }
+            ]
+
+        # Filtering on the version read above makes the read-modify-write atomic per session
+        saved = self.chats.find_one_and_update(
+            {"session_id": session_id, "version": doc.get("version", {"$exists": False})},
+            update,
+            projection=SESSION_FIELDS,
+            return_document=ReturnDocument.AFTER,
+        )
+        if saved is None:
+            raise SessionConflict(f"Session {session_id} changed while saving")
+        return _session_info(saved)
+
+    def append_messages(self, session_id: str, new_messages: List[Dict]) -> Dict:
+        now = datetime.utcnow()
+        doc = self.chats.find_one_and_update(
+            {"session_id": session_id},
+            {
+                "$push": {"messages": {"$each": new_messages}},
+                "$inc": {"message_count": len(new_messages), "version": 1},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"created_at": now, "title": "New Chat"},
+            },
+            projection=SESSION_FIELDS,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return _session_info(doc)
+
+    def save_summary(self, session_id: str, summary: str, summary_upto: int) -> bool:
+        """Store the summary of the first summary_upto messages unless one reaching as far exists"""
+        result = self.chats.update_one(
+            {
+                "session_id": session_id,
+                "message_count": {"$gte": summary_upto},
+                "$or": [{"summary_upto": {"$lt": summary_upto}}, {"summary_upto": {"$exists": False}}],
+            },
+            {"$set": {"summary": summary, "summary_upto": summary_upto}},
+        )
+        return result.modified_count > 0
+
+    def delete_session(self, session_id: str) -> bool:
+        return self.chats.delete_one({"session_id": session_id}).deleted_count > 0
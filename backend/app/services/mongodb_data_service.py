@@ -1,69 +1,281 @@
+import uuid
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from typing import Iterable, List
+from app.utils.config import CSV_BATCH_SIZE
 from app.utils.custom_logging import custom_logger
 from app.services.mongodb_service import mongodb_service
 
-log = custom_logger() 
+log = custom_logger()
 
 
 
 class MongoDBDataService:
     """
     Handles CSV data storage in MongoDB
-    Collection: csv_data
+    Collection: csv_data - one header per file (columns, row_count, current version)
+    Collection: csv_rows - the rows, in fixed-size columnar batches keyed by (file_name, version, seq)
+
+    A save writes all batches under a fresh version and only then points the header at
+    it, so readers always see a complete dataset; batches of older versions are removed
+    afterwards. An append adds batches to the current version and then raises the
+    header's row_count; readers only read rows below the row_count they saw. Headers
+    written by the old layout (all rows in one "data" field) are still readable.
     """
 
     def __init__(self):
         self.csv_collection = None
+        self.rows_collection = None
 
         if mongodb_service.db is not None:
             self.csv_collection = mongodb_service.db.csv_data
+            self.rows_collection = mongodb_service.db.csv_rows
+            try:
+                self.rows_collection.create_index(
+                    [("file_name", 1), ("version", 1), ("seq", 1)], unique=True
+                )
+                self.rows_collection.create_index([("file_name", 1), ("version", 1), ("start_row", 1)])
+            except Exception as e:
+                log.warning(f"Could not create csv_rows index: {e}")
             log.info("MongoDB CSV data service initialized")
         else:
             log.warning("MongoDB not available for CSV storage")
 
+    @staticmethod
+    def _column_values(series: pd.Series) -> List:
+        """Plain Python values of a column, with NaN/NaT stored as null"""
+        return series.astype(object).where(series.notna(), None).tolist()
+
+    def _batch_documents(self, file_name: str, version: str, chunks: Iterable[pd.DataFrame], start_seq: int = 0, start_row: int = 0):
+        seq = start_seq
+        row = start_row
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            yield {
+                "file_name": file_name,
+                "version": version,
+                "seq": seq,
+                "start_row": row,
+                "row_count": len(chunk),
+                "columns": [self._column_values(chunk[c]) for c in chunk.columns],
+            }
+            seq += 1
+            row += len(chunk)
+
+    def write_batches(self, file_name: str, version: str, chunks: Iterable[pd.DataFrame], start_seq: int = 0, start_row: int = 0):
+        """Insert row batches under a version with unordered bulk writes; returns (rows, batches) written"""
+        from pymongo import InsertOne
+
+        rows = 0
+        batches = 0
+        pending = []
+        for doc in self._batch_documents(file_name, version, chunks, start_seq, start_row):
+            rows += doc["row_count"]
+            batches += 1
+            pending.append(InsertOne(doc))
+            if len(pending) >= 16:
+                self.rows_collection.bulk_write(pending, ordered=False)
+                pending = []
+        if pending:
+            self.rows_collection.bulk_write(pending, ordered=False)
+        return rows, batches
+
+    def publish_version(self, file_name: str, version: str, columns: List[str], row_count: int, batch_count: int, **extra) -> None:
+        """Point the header at a fully written version, then drop the batches of older versions"""
+        self.csv_collection.update_one(
+            {"file_name": file_name},
+            {
+                "$set": {
+                    "file_name": file_name,
+                    "layout": "chunked",
+                    "version": version,
+                    "columns": columns,
+                    "row_count": row_count,
+                    "batch_count": batch_count,
+                    "batch_size": CSV_BATCH_SIZE,
+                    "updated_at": datetime.utcnow(),
+                    **extra,
+                },
+                "$unset": {"data": ""},
+            },
+            upsert=True,
+        )
+        self.rows_collection.delete_many({"file_name": file_name, "version": {"$ne": version}})
+
+    @staticmethod
+    def _frame_chunks(df: pd.DataFrame) -> Iterable[pd.DataFrame]:
+        return (df.iloc[start : start + CSV_BATCH_SIZE] for start in range(0, len(df), CSV_BATCH_SIZE))
+
+    def save_csv_chunks(self, file_name: str, columns: List[str], chunks: Iterable[pd.DataFrame], **extra) -> int:
+        """
+        Store a dataset streamed as chunks under a fresh version and publish it; returns rows
+        written. Raises on failure, leaving the previously published version in place.
+        """
+        version = uuid.uuid4().hex
+        try:
+            rows, batch_count = self.write_batches(file_name, version, chunks)
+            self.publish_version(file_name, version, [str(c) for c in columns], rows, batch_count, **extra)
+        except Exception:
+            self.rows_collection.delete_many({"file_name": file_name, "version": version})
+            raise
+
+        log.info(f"Saved {file_name} to MongoDB ({rows} rows, {batch_count} batches)")
+        return rows
+
+    def append_csv_chunks(self, file_name: str, chunks: Iterable[pd.DataFrame], **extra) -> int:
+        """
+        Append rows to the current version of a chunked dataset (e.g. new ledger entries in
+        transaction.csv); returns rows written. The version stays the same, which tells
+        readers the existing rows are unchanged and only rows past their row_count need
+        fetching. Raises on failure.
+        """
+        header = self.get_csv_header(file_name)
+        if header is None or header.get("layout") != "chunked":
+            raise ValueError(f"{file_name} has no chunked dataset to append to")
+
+        columns = header["columns"]
+
+        def checked(chunks):
+            for chunk in chunks:
+                if [str(c) for c in chunk.columns] != columns:
+                    raise ValueError(f"Columns do not match stored columns of {file_name}")
+                yield chunk
+
+        rows, batch_count = self.write_batches(
+            file_name, header["version"], checked(chunks), start_seq=header["batch_count"], start_row=header["row_count"]
+        )
+        self.csv_collection.update_one(
+            {"file_name": file_name, "version": header["version"]},
+            {
+                "$inc": {"row_count": rows, "batch_count": batch_count},
+                "$set": {"updated_at": datetime.utcnow(), **extra},
+            },
+        )
+
+        log.info(f"Appended {rows} rows to {file_name}")
+        return rows
+
     def save_csv_data(self, file_name: str, df: pd.DataFrame) -> bool:
         try:
             if self.csv_collection is None:
                 return False
 
+            self.save_csv_chunks(file_name, list(df.columns), self._frame_chunks(df))
+            return True
 
-            records = df.to_dict("records")
+        except Exception as e:
+            log.error(f"Error saving {file_name}: {e}")
+            return False
 
-            self.csv_collection.update_one(
-                {"file_name": file_name},
-                {
-                    "$set": {
-                        "file_name": file_name,
-                        "data": records,
-                        "row_count": len(records),
-                        "updated_at": datetime.utcnow(),
-                    }
-                },
-                upsert=True,
-            )
+    def append_csv_data(self, file_name: str, df: pd.DataFrame) -> bool:
+        try:
+            if self.csv_collection is None:
+                return False
 
-            log.info(f"Saved {file_name} to MongoDB ({len(records)} rows)")
+            self.append_csv_chunks(file_name, self._frame_chunks(df))
             return True
 
         except Exception as e:
-            log.error(f"Error saving {file_name}: {e}")
+            log.error(f"Error appending to {file_name}: {e}")
             return False
 
-    def load_csv_data(self, file_name: str):
+    def get_csv_header(self, file_name: str):
+        """Stored header of a dataset (columns, version, counts, source checksum) without any rows, or None"""
+        if self.csv_collection is None:
+            return None
+        return self.csv_collection.find_one({"file_name": file_name}, {"_id": 0, "data": 0})
+
+    def get_csv_metadata(self, file_name: str):
+        """
+        Cheap freshness stamp of a stored dataset (updated_at, row_count, version) without the rows.
+        None when MongoDB is unavailable or the dataset is missing.
+        """
         try:
             if self.csv_collection is None:
                 return None
 
-            doc = self.csv_collection.find_one({"file_name": file_name})
+            doc = self.csv_collection.find_one(
+                {"file_name": file_name},
+                {"_id": 0, "updated_at": 1, "row_count": 1, "version": 1},
+            )
             if doc is None:
                 return None
 
-            return pd.DataFrame(doc["data"])
+            updated_at = doc.get("updated_at")
+            return {
+                "updated_at": updated_at.isoformat() if updated_at else None,
+                "row_count": doc.get("row_count"),
+                "version": doc.get("version"),
+            }
+
+        except Exception as e:
+            log.error(f"Error reading metadata of {file_name}: {e}")
+            return None
+
+    def read_batches(self, file_name: str, version: str, columns: List[str], end_row: int, start_row: int = 0) -> pd.DataFrame:
+        """
+        Stream the batches holding rows [start_row, end_row) of a version through a cursor
+        into pre-sized column arrays, instead of materializing a list of row dicts.
+        Batches always start on an append boundary, so start_row is a batch start.
+        """
+        row_count = end_row - start_row
+        arrays = [np.empty(row_count, dtype=object) for _ in columns]
+        offset = 0
+        cursor = self.rows_collection.find(
+            {"file_name": file_name, "version": version, "start_row": {"$gte": start_row, "$lt": end_row}},
+            {"_id": 0, "columns": 1, "row_count": 1},
+            sort=[("seq", 1)],
+            batch_size=8,
+        )
+        for batch in cursor:
+            n = batch["row_count"]
+            if offset + n > row_count:
+                raise RuntimeError(f"{file_name} has more rows than its header reports ({end_row})")
+            for array, values in zip(arrays, batch["columns"]):
+                array[offset : offset + n] = values
+            offset += n
+        if offset != row_count:
+            raise RuntimeError(f"{file_name} is incomplete: read {offset} of {row_count} rows")
+
+        return pd.DataFrame(dict(zip(columns, arrays)), columns=columns).infer_objects()
+
+    def load_csv_data(self, file_name: str):
+        try:
+            if self.csv_collection is None:
+                return None
+
+            header = self.csv_collection.find_one({"file_name": file_name}, {"data": 0})
+            if header is None:
+                return None
+
+            if header.get("layout") != "chunked":
+                # Legacy single-document layout
+                doc = self.csv_collection.find_one({"file_name": file_name}, {"data": 1})
+                return pd.DataFrame(doc.get("data", []))
+
+            return self.read_batches(file_name, header["version"], header["columns"], header["row_count"])
 
         except Exception as e:
             log.error(f"Error loading {file_name}: {e}")
             return None
 
+    def load_csv_rows(self, file_name: str, version: str, start_row: int, end_row: int):
+        """Rows [start_row, end_row) of one version of a chunked dataset, or None"""
+        try:
+            if self.csv_collection is None:
+                return None
+
+            header = self.csv_collection.find_one({"file_name": file_name}, {"columns": 1, "version": 1})
+            if header is None or header.get("version") != version:
+                return None
+
+            return self.read_batches(file_name, version, header["columns"], end_row, start_row=start_row)
+
+        except Exception as e:
+            log.error(f"Error loading rows {start_row}-{end_row} of {file_name}: {e}")
+            return None
+
 
 mongodb_data_service = MongoDBDataService()
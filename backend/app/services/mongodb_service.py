@@ -70,17 +70,25 @@
 # mongodb_service = MongoDBService()
 
 from typing import List, Dict
-from datetime import datetime
 from app.utils.custom_logging import custom_logger
 
 log = custom_logger()
 
+# Attempts at saving a chat while other writers keep changing it
+SAVE_RETRIES = 3
+
 class MongoDBService:
+    """
+    The MongoDB connection. Chats themselves are read and written by MongoSessionStore;
+    the helpers below go through it, or keep chats in memory without MongoDB.
+    """
+
     def __init__(self):
         self.client = None
         self.db = None
         self.chats = None
         self.local_chats = {}
+        self._sessions = None
 
         try:
             from pymongo import MongoClient
@@ -97,24 +105,41 @@ class MongoDBService:
             self.db = None
             self.chats = None
 
-    def save_chat(self, session_id: str, messages: List[Dict]):
+    def sessions(self):
+        """The MongoSessionStore on the chats collection"""
+        if self._sessions is None:
+            from app.services.mongo_session_store import MongoSessionStore
+
+            self._sessions = MongoSessionStore()
+        return self._sessions
+
+    def save_chat(self, session_id: str, messages: List[Dict]) -> bool:
+        """
+        Store a session's full message list: the new tail is appended when it extends what
+        is stored, otherwise it replaces it. Returns False when the save did not apply.
+        """
         try:
-            if self.chats is not None:
-                self.chats.update_one(
-                    {"session_id": session_id},
-                    {"$set": {"messages": messages, "updated_at": datetime.utcnow()}},
-                    upsert=True,
-                )
-            else:
-                self.local_chats[session_id] = messages
+            if self.chats is None:
+                self.local_chats[session_id] = list(messages)
+                return True
+            from app.services.session_store import SessionConflict
+
+            for _ in range(SAVE_RETRIES):
+                try:
+                    self.sessions().save_messages(session_id, messages)
+                    return True
+                except SessionConflict:
+                    continue
+            log.warning(f"Could not save chat {session_id}: other writers kept changing it")
+            return False
         except Exception as e:
             log.error(f"Error saving chat: {e}")
+            return False
 
     def get_chat_history(self, session_id: str) -> List[Dict]:
         try:
             if self.chats is not None:
-                doc = self.chats.find_one({"session_id": session_id})
-                return doc.get("messages", []) if doc else []
+                return self.sessions().get_messages(session_id)
             return self.local_chats.get(session_id, [])
         except Exception as e:
             log.error(f"Error getting chat history: {e}")
@@ -126,15 +151,7 @@ class MongoDBService:
         """
         try:
             if self.chats is not None:
-                sessions = []
-                for doc in self.chats.find({}, {"session_id": 1, "messages": 1, "updated_at": 1}):
-                    session_info = {
-                        "session_id": doc.get("session_id", ""),
-                        "message_count": len(doc.get("messages", [])),
-                        "updated_at": doc.get("updated_at", "").isoformat() if doc.get("updated_at") else ""
-                    }
-                    sessions.append(session_info)
-                return sessions
+                return self.sessions().list_sessions()[0]
             else:
                 # For in-memory storage
                 sessions = []
@@ -150,5 +167,3 @@ class MongoDBService:
             return []
 
 mongodb_service = MongoDBService()
-
-
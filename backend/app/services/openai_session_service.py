@@ -1,87 +1,128 @@
-from typing import List, Dict, Optional
-from datetime import datetime
-import json
+from typing import List, Dict, Optional, Tuple
+import asyncio
 import os
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.utils.custom_logging import custom_logger
-from app.utils.config import OPENAI_API_KEY
+from app.utils.config import (
+    OPENAI_API_KEY,
+    SESSION_BACKEND,
+    SESSION_CACHE_MAX_BYTES,
+    SESSION_CACHE_TTL,
+    SESSION_DB_PATH,
+)
+from app.chatbot.context import summarize, summary_cut
+from app.chatbot.llm import llm_registry
+from app.services.conversation_mirror import ConversationMirror
+from app.services.session_cache import CachedSessionStore
+from app.services.session_store import SessionConflict, SessionStore, make_title
 
 log = custom_logger()
 
+
+def create_session_store():
+    """
+    The session store selected by SESSION_BACKEND (both are safe to share between
+    workers), behind a per-worker cache of hot sessions unless SESSION_CACHE_MAX_BYTES is 0
+    """
+    store = None
+    if SESSION_BACKEND.lower() == "mongodb":
+        try:
+            from app.services.mongo_session_store import MongoSessionStore
+
+            store = MongoSessionStore()
+        except Exception as e:
+            log.warning(f"MongoDB session store unavailable, using SQLite: {e}")
+    if store is None:
+        # Sessions used to live in one JSON file rewritten on every turn; it is imported once
+        legacy_metadata_file = os.path.join(os.path.dirname(__file__), "../../sessions/_metadata.json")
+        store = SessionStore(SESSION_DB_PATH, legacy_metadata_file)
+    if SESSION_CACHE_MAX_BYTES <= 0:
+        return store
+    return CachedSessionStore(store, SESSION_CACHE_MAX_BYTES, SESSION_CACHE_TTL)
+
+
 class OpenAISessionService:
-    """Service using OpenAI Conversations API for state management"""
+    """
+    Service using OpenAI Conversations API for state management
+
+    Every method is a coroutine: OpenAI calls go through AsyncOpenAI and storage calls run
+    in worker threads, so a slow request never stalls other chats on the event loop.
+    Sessions are persisted on every turn and only cached in process (see
+    CachedSessionStore), so any number of workers can serve a session.
+    """
     
     def __init__(self):
         if not OPENAI_API_KEY:
             raise RuntimeError("OPENAI_API_KEY not found")
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-        self.metadata_file = os.path.join(os.path.dirname(__file__), "../../sessions/_metadata.json")
-        os.makedirs(os.path.dirname(self.metadata_file), exist_ok=True)
-        self.metadata = self._load_metadata()
+        # Conversations API calls share the model calls' connection pool
+        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=llm_registry.http_client("openai"))
+        self.store = create_session_store()
+        self.mirror = ConversationMirror(self.client)
+        # Summary refreshes in flight (the event loop only keeps weak references to tasks)
+        self._summary_tasks = set()
     
-    def _load_metadata(self) -> Dict:
-        try:
-            if os.path.exists(self.metadata_file):
-                with open(self.metadata_file, 'r') as f:
-                    return json.load(f)
-        except:
-            pass
-        return {}
-    
-    def _save_metadata(self):
-        try:
-            with open(self.metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
-        except Exception as e:
-            log.error(f"Error saving metadata: {e}")
-    
-    def create_session(self, session_id: str, initial_message: Optional[str] = None) -> str:
+    async def create_session(self, session_id: str, initial_message: Optional[str] = None) -> str:
         """Create conversation using OpenAI Conversations API"""
+        if not self.mirror.enabled:
+            # Nothing will be mirrored, so a remote conversation would stay empty
+            await asyncio.to_thread(self.store.create_session, session_id, None, make_title(initial_message))
+            return session_id
         try:
-            conversation = self.client.conversations.create()
+            conversation = await self.client.conversations.create()
             conv_id = conversation.id
             
-            self.metadata[session_id] = {
-                "conversation_id": conv_id,
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
-                "title": (initial_message[:50] + "...") if initial_message and len(initial_message) > 50 else (initial_message or "New Chat")
-            }
-            self._save_metadata()
+            await asyncio.to_thread(self.store.create_session, session_id, conv_id, make_title(initial_message))
             log.info(f"Created conversation {conv_id} for session {session_id}")
             return conv_id
         except Exception as e:
             log.warning(f"Conversations API not available, using local storage: {e}")
             # Fallback to local storage
-            self.metadata[session_id] = {
-                "conversation_id": None,
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat(),
-                "title": (initial_message[:50] + "...") if initial_message and len(initial_message) > 50 else (initial_message or "New Chat"),
-                "messages": []
-            }
-            self._save_metadata()
+            await asyncio.to_thread(self.store.create_session, session_id, None, make_title(initial_message))
             return session_id
     
-    def get_conversation_id(self, session_id: str) -> Optional[str]:
+    async def get_conversation_id(self, session_id: str) -> Optional[str]:
         """Get conversation ID for session"""
-        return self.metadata.get(session_id, {}).get("conversation_id")
+        session = await asyncio.to_thread(self.store.get_session, session_id)
+        return session.get("conversation_id") if session else None
     
-    def get_chat_history(self, session_id: str) -> List[Dict]:
+    async def get_version(self, session_id: str) -> int:
+        """Current version of a session (0 when missing), for save_chat's conflict check"""
+        return await asyncio.to_thread(self.store.get_version, session_id)
+
+    async def get_turn_state(self, session_id: str) -> Tuple[List[Dict], Optional[int], Optional[str], int]:
+        """
+        What a turn needs of a session: the messages not folded into its summary, the
+        version they were read at, the summary, and how many messages it folds
+        """
+        session = await asyncio.to_thread(self.store.get_session, session_id)
+        summary = session.get("summary") if session else None
+        summary_upto = (session.get("summary_upto") or 0) if summary else 0
+        messages, version = await self.get_chat_state(session_id, summary_upto)
+        return messages, version, summary, summary_upto
+
+    async def get_chat_history(self, session_id: str) -> List[Dict]:
         """Retrieve messages from local storage (primary source)"""
+        messages, _ = await self.get_chat_state(session_id)
+        return messages
+
+    async def get_chat_state(self, session_id: str, start: int = 0) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Messages of a session from index start on and the version they were read at
+        (None when unknown)
+        """
         try:
             # Primary source: local storage (always reliable)
-            local_messages = self.metadata.get(session_id, {}).get("messages", [])
+            local_messages, version = await asyncio.to_thread(self.store.get_history, session_id, start)
             
             # If we have local messages, return them
-            if local_messages:
-                return local_messages
+            if local_messages or start:
+                return local_messages, version
             
             # If no local messages, try to get from OpenAI Conversation (optional sync)
-            conv_id = self.get_conversation_id(session_id)
+            conv_id = await self.get_conversation_id(session_id)
             if conv_id:
                 try:
-                    conversation = self.client.conversations.retrieve(conv_id)
+                    conversation = await self.client.conversations.retrieve(conv_id)
                     messages = []
                     
                     # Access items from conversation object
@@ -112,89 +153,112 @@ class OpenAISessionService:
                     
                     # If we got messages from OpenAI, save them locally
                     if messages:
-                        if session_id not in self.metadata:
-                            self.metadata[session_id] = {}
-                        self.metadata[session_id]["messages"] = messages
-                        self._save_metadata()
+                        await asyncio.to_thread(self.store.save_messages, session_id, messages)
                     
-                    return messages
+                    return messages, None
                 except Exception as e:
                     log.warning(f"Could not retrieve from conversation: {e}")
 
             # Return empty if nothing found
-            return []
+            return [], version
 
         except Exception as e:
             log.error(f"Error getting chat history: {e}")
-            return self.metadata.get(session_id, {}).get("messages", [])
+            return [], None
 
     
-    def save_chat(self, session_id: str, messages: List[Dict]):
-        """Save chat to conversation or local storage"""
+    async def save_chat(self, session_id: str, messages: List[Dict], expected_version: Optional[int] = None, start: int = 0):
+        """
+        Save chat to conversation or local storage. messages is the history the turn was
+        answered from (the session's messages from index start on) plus the new
+        user/assistant pair; with expected_version (the version that history was read at)
+        a session changed meanwhile by another request keeps its messages and just gets
+        the new pair appended.
+        """
         try:
-            if session_id not in self.metadata:
-                self.create_session(session_id)
+            if await asyncio.to_thread(self.store.get_session, session_id) is None:
+                await self.create_session(session_id)
+                expected_version = None
             
-            # Always store messages locally as backup
-            self.metadata[session_id]["messages"] = messages
-            self.metadata[session_id]["updated_at"] = datetime.utcnow().isoformat()
+            # Always store messages locally as backup (only the new tail is written; also sets the title)
+            try:
+                session = await asyncio.to_thread(self.store.save_messages, session_id, messages, expected_version, start)
+                self._schedule_summary(session, messages, start)
+            except SessionConflict as e:
+                log.info(f"{e}; appending the turn instead")
+                await asyncio.to_thread(self.store.append_messages, session_id, messages[-2:])
             
-            # Try to save to OpenAI conversation using Responses API
-            conv_id = self.get_conversation_id(session_id)
+            # Mirror the turn into the OpenAI conversation in the background (no model call)
+            conv_id = await self.get_conversation_id(session_id)
             if conv_id:
-                try:
-                    # Get last user and assistant messages
-                    user_msg = next((m for m in reversed(messages) if m.get("role") == "user"), None)
-                    assistant_msg = next((m for m in reversed(messages) if m.get("role") == "assistant"), None)
-                    
-                    if user_msg and assistant_msg:
-                        # Use Responses API to add to conversation
-                        self.client.responses.create(
-                            model="gpt-4o-mini",
-                            input=[
-                                {"role": "user", "content": user_msg.get("content", "")},
-                                {"role": "assistant", "content": assistant_msg.get("content", "")}
-                            ],
-                            conversation=conv_id,
-                            store=True
-                        )
-                except Exception as e:
-                    log.warning(f"Could not save to OpenAI conversation (using local storage): {e}")
-            
-            # Update title
-            first_user = next((m for m in messages if m.get("role") == "user"), None)
-            if first_user and (not self.metadata[session_id].get("title") or self.metadata[session_id].get("title") == "New Chat"):
-                content = first_user.get("content", "")
-                self.metadata[session_id]["title"] = content[:50] + "..." if len(content) > 50 else content
-            
-            self._save_metadata()
+                # Get last user and assistant messages
+                user_msg = next((m for m in reversed(messages) if m.get("role") == "user"), None)
+                assistant_msg = next((m for m in reversed(messages) if m.get("role") == "assistant"), None)
+                
+                if user_msg and assistant_msg:
+                    self.mirror.submit(conv_id, user_msg.get("content", ""), assistant_msg.get("content", ""))
         except Exception as e:
             log.error(f"Error saving chat: {e}")
     
-    def get_all_sessions(self) -> List[Dict]:
+    def _schedule_summary(self, session: Dict, messages: List[Dict], start: int = 0):
+        """
+        Fold turns into the session summary in the background once enough have piled up;
+        messages are the session's messages from index start on
+        """
+        summarized = (session.get("summary_upto") or 0) - start
+        if summarized < 0:
+            # The summary was reset meanwhile; the next turn reads the whole history again
+            return
+        cut = summary_cut(messages, summarized)
+        if cut <= summarized:
+            return
+        task = asyncio.get_running_loop().create_task(
+            self._refresh_summary(session["session_id"], session.get("summary"), messages[summarized:cut], start + cut)
+        )
+        self._summary_tasks.add(task)
+        task.add_done_callback(self._summary_tasks.discard)
+
+    async def _refresh_summary(self, session_id: str, summary: Optional[str], messages: List[Dict], summary_upto: int):
+        try:
+            summary = await summarize(summary, messages)
+            await asyncio.to_thread(self.store.save_summary, session_id, summary, summary_upto)
+            log.info(f"Summarized {session_id} up to message {summary_upto}")
+        except Exception as e:
+            log.warning(f"Could not summarize session {session_id}: {e}")
+
+    async def get_all_sessions(self) -> List[Dict]:
         """Get all session metadata"""
-        sessions = [{
-            "session_id": sid,
-            "title": meta.get("title", "New Chat"),
-            "created_at": meta.get("created_at"),
-            "updated_at": meta.get("updated_at")
-        } for sid, meta in self.metadata.items()]
-        sessions.sort(key=lambda x: x.get("updated_at", ""), reverse=True)
+        sessions, _ = await asyncio.to_thread(self.store.list_sessions)
         return sessions
+
+    async def get_sessions_page(self, limit: int, cursor: Optional[str] = None) -> Dict:
+        """One page of session metadata, most recently updated first"""
+        sessions, next_cursor = await asyncio.to_thread(self.store.list_sessions, limit, cursor)
+        return {"sessions": sessions, "next_cursor": next_cursor}
+
+    async def get_messages_page(self, session_id: str, limit: int, cursor: Optional[str] = None) -> Dict:
+        """The latest messages of a session before cursor, in chat order"""
+        messages, next_cursor = await asyncio.to_thread(self.store.get_messages_page, session_id, limit, cursor)
+        if not messages and cursor is None:
+            # Nothing stored locally yet; fall back to the full (remote-synced) history
+            messages, next_cursor = await self.get_chat_history(session_id), None
+        return {"messages": messages, "next_cursor": next_cursor}
     
-    def delete_session(self, session_id: str):
+    def cache_stats(self) -> Optional[Dict]:
+        """Session cache counters, or None when the cache is disabled"""
+        return self.store.stats() if isinstance(self.store, CachedSessionStore) else None
+
+    async def delete_session(self, session_id: str):
         """Delete conversation and metadata"""
         try:
-            conv_id = self.get_conversation_id(session_id)
+            conv_id = await self.get_conversation_id(session_id)
             if conv_id:
                 try:
-                    self.client.conversations.delete(conv_id)
+                    await self.client.conversations.delete(conv_id)
                 except:
                     pass
             
-            if session_id in self.metadata:
-                del self.metadata[session_id]
-                self._save_metadata()
+            await asyncio.to_thread(self.store.delete_session, session_id)
             log.info(f"Deleted session {session_id}")
         except Exception as e:
             log.error(f"Error deleting session: {e}")
@@ -0,0 +1,101 @@
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+DELIMITER = " | "
+# Rough English/tabular average; good enough for budgeting without running a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+class RenderBudget:
+    """Row and token allowance shared by every table rendered into one tool response"""
+
+    def __init__(self, max_rows: int, max_tokens: int):
+        self.rows_left = max_rows
+        self.chars_left = max_tokens * CHARS_PER_TOKEN
+
+    def take(self, line: str, is_row: bool = True) -> bool:
+        if (is_row and self.rows_left <= 0) or len(line) + 1 > self.chars_left:
+            return False
+        if is_row:
+            self.rows_left -= 1
+        self.chars_left -= len(line) + 1
+        return True
+
+    def charge(self, text: str):
+        self.chars_left -= len(text) + 1
+
+
+class TableRenderer:
+    """
+    Pipe-delimited rendering of one table, pre-rendered at load time.
+
+    Every row is rendered once (cells and the full joined line), so producing a result is
+    a list lookup plus a join instead of a DataFrame.to_string over the matches.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns: List[str] = [str(c) for c in df.columns]
+        self.cells = self._render_cells(df)
+        self.lines = [DELIMITER.join(cells) for cells in self.cells]
+
+    @staticmethod
+    def _render_cells(df: pd.DataFrame) -> List[tuple]:
+        return [
+            tuple("" if pd.isna(v) else str(v) for v in row)
+            for row in df.itertuples(index=False, name=None)
+        ]
+
+    def extended(self, df: pd.DataFrame) -> "TableRenderer":
+        """A new renderer with df's rows appended; existing rows are not re-rendered"""
+        cells = self._render_cells(df)
+        renderer = TableRenderer.__new__(TableRenderer)
+        renderer.columns = self.columns
+        renderer.cells = self.cells + cells
+        renderer.lines = self.lines + [DELIMITER.join(c) for c in cells]
+        return renderer
+
+    def project(self, columns: Optional[List[str]]) -> Optional[List[int]]:
+        """Positions of the requested columns (case-insensitive), always keeping the id column first"""
+        if not columns:
+            return None
+        wanted = {str(c).strip().lower() for c in columns}
+        positions = [i for i, c in enumerate(self.columns) if c.lower() in wanted]
+        if not positions:
+            return None
+        return positions if positions[0] == 0 else [0] + positions
+
+    def render(
+        self,
+        title: str,
+        rows: np.ndarray,
+        budget: RenderBudget,
+        columns: Optional[List[str]] = None,
+    ) -> str:
+        positions = self.project(columns)
+        header = DELIMITER.join(self.columns[i] for i in positions) if positions else DELIMITER.join(self.columns)
+
+        # Title and trailer lines are small; charge the title and let the rows use the rest
+        budget.charge(title)
+        lines = []
+        if budget.rows_left > 0 and budget.take(header, is_row=False):
+            for row in rows:
+                if positions is None:
+                    line = self.lines[row]
+                else:
+                    cells = self.cells[row]
+                    line = DELIMITER.join(cells[i] for i in positions)
+                if not budget.take(line):
+                    break
+                lines.append(line)
+
+        omitted = len(rows) - len(lines)
+        if not lines:
+            text = f"\n{title}: {omitted} matching rows omitted (output budget reached)\n"
+        elif omitted:
+            text = f"\n{title} ({len(lines)} of {len(rows)} rows):\n{header}\n" + "\n".join(lines)
+            text += f"\n... {omitted} more rows omitted; narrow the query, add filters or use aggregate_accounting\n"
+        else:
+            text = f"\n{title} ({len(rows)} rows):\n{header}\n" + "\n".join(lines) + "\n"
+        return text
@@ -0,0 +1,177 @@
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+NGRAM_SIZE = 3
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Words of the kind every question has; they carry no evidence either way
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "were", "you", "your", "this", "that", "these", "those", "with",
+    "what", "who", "whom", "how", "why", "when", "where", "which", "can", "could", "would", "should",
+    "does", "did", "has", "have", "had", "there", "here", "about", "please", "tell", "explain", "show",
+    "give", "list", "find", "get", "need", "know", "want", "help", "urgently", "check", "hello", "thanks",
+    "any", "all", "much", "many", "some", "from", "into", "our", "their", "its", "not", "than", "then",
+    "also", "just", "only", "more", "most", "less", "per", "each", "will", "shall", "may", "might",
+}
+
+
+def row_texts(df: pd.DataFrame) -> List[str]:
+    """Lowercase text of every row, built the same way the row-wise search used to build it"""
+    return [
+        " ".join(str(v).lower() for v in row if pd.notna(v))
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens longer than 2 chars, matching the old keyword filter"""
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if len(t) > 2]
+
+
+def query_terms(text: str) -> List[str]:
+    """The tokens of a question that say what it is about: no question words, no bare numbers"""
+    return [t for t in tokenize(text) if t not in STOPWORDS and not t.isdigit()]
+
+
+def ngrams(text: str) -> Set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def build_postings(texts: List[str], offset: int = 0) -> Dict[str, np.ndarray]:
+    postings: Dict[str, List[int]] = defaultdict(list)
+    for row_id, text in enumerate(texts, start=offset):
+        for gram in ngrams(text):
+            postings[gram].append(row_id)
+    return {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+
+class KeywordIndex:
+    """
+    Trigram inverted index over the row texts of one table.
+
+    Posting lists narrow a keyword down to candidate rows and every candidate is then
+    confirmed with a plain substring check, so results are identical to scanning each
+    row ("amit" still matches "Amit Kumar", "2024-11" still matches dates).
+    """
+
+    def __init__(self, texts: List[str], postings: Dict[str, np.ndarray] = None):
+        self.texts = texts
+        self.postings: Dict[str, np.ndarray] = build_postings(texts) if postings is None else postings
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "KeywordIndex":
+        return cls(row_texts(df))
+
+    def extended(self, texts: List[str]) -> "KeywordIndex":
+        """
+        A new index with rows appended. Only the posting lists of trigrams that occur in
+        the new rows are copied; the rest are shared with this (unchanged) index.
+        """
+        postings = dict(self.postings)
+        for gram, ids in build_postings(texts, offset=len(self.texts)).items():
+            existing = postings.get(gram)
+            postings[gram] = ids if existing is None else np.concatenate([existing, ids])
+        return KeywordIndex(self.texts + texts, postings)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _candidates(self, keyword: str) -> Iterable[int]:
+        grams = ngrams(keyword)
+        if not grams:
+            # Too short to index; fall back to checking every row
+            return range(len(self.texts))
+
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return ()
+            lists.append(ids)
+        lists.sort(key=len)
+
+        candidates = lists[0]
+        for ids in lists[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if candidates.size == 0:
+                break
+        return candidates.tolist()
+
+    def match(self, keyword: str) -> np.ndarray:
+        """Sorted ids of rows whose text contains keyword"""
+        texts = self.texts
+        return np.asarray(
+            [i for i in self._candidates(keyword) if keyword in texts[i]], dtype=np.int64
+        )
+
+    def match_any(self, keywords: List[str]) -> np.ndarray:
+        """Sorted ids of rows containing at least one of the keywords"""
+        matches = [self.match(kw) for kw in keywords]
+        if not matches:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(matches))
+
+
+class BM25Index:
+    """
+    Okapi BM25 over pre-tokenized documents.
+
+    The term/document matrix is kept in CSR layout keyed by term, with the BM25 term
+    weight of every posting computed once at build time. Scoring a query is then one
+    vectorized scatter-add per query term followed by an argpartition top-k.
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        tokenized = [tokenize(doc) for doc in documents]
+        self.doc_count = len(tokenized)
+        doc_len = np.asarray([len(tokens) for tokens in tokenized], dtype=np.float64)
+        avg_len = doc_len.mean() if self.doc_count and doc_len.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_id, tokens in enumerate(tokenized):
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+
+        self.vocab: Dict[str, int] = {}
+        indptr = [0]
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        for term_id, (term, plist) in enumerate(postings.items()):
+            self.vocab[term] = term_id
+            doc_ids.extend(d for d, _ in plist)
+            tfs.extend(tf for _, tf in plist)
+            indptr.append(len(doc_ids))
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        tf = np.asarray(tfs, dtype=np.float64)
+        df = np.diff(self.indptr).astype(np.float64)
+        idf = np.log1p((self.doc_count - df + 0.5) / (df + 0.5))
+        norm = k1 * (1.0 - b + b * doc_len[self.doc_ids] / avg_len)
+        self.weights = np.repeat(idf, np.diff(self.indptr)) * tf * (k1 + 1.0) / (tf + norm)
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def score(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.doc_count, dtype=np.float64)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # A term appears at most once per document, so plain fancy-index add is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def top_k(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and scores of the k best matching documents (score > 0), best first"""
+        scores = self.score(query)
+        matched = np.flatnonzero(scores > 0)
+        if matched.size > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order, scores[order]
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.session_store import SessionConflict
+
+# Rough per-object overhead of a cached message dict and of a session entry, in bytes
+MESSAGE_OVERHEAD = 240
+ENTRY_OVERHEAD = 600
+
+
+def _normalized(messages: List[Dict]) -> List[Dict]:
+    """Messages as the stores return them after saving"""
+    return [{"role": m.get("role", "user"), "content": str(m.get("content", ""))} for m in messages]
+
+
+class _Entry:
+    # messages holds the session's messages from index start on
+    __slots__ = ("session", "messages", "start", "version", "size", "last_used")
+
+    def __init__(self, session: Optional[Dict], messages: Optional[List[Dict]], version: int, start: int = 0):
+        self.session = session
+        self.messages = messages
+        self.start = start
+        self.version = version
+        self.size = ENTRY_OVERHEAD + sum(
+            MESSAGE_OVERHEAD + len(m["role"]) + len(m["content"]) for m in messages or []
+        )
+        self.last_used = time.monotonic()
+
+
+class CachedSessionStore:
+    """
+    Read-through/write-through cache of recently used sessions in front of a session
+    store, with the same interface as the store.
+
+    Session metadata and full histories are kept in LRU order within a memory budget
+    (estimated from message sizes) and dropped once idle for ttl_seconds, so a worker's
+    footprint stays bounded however many sessions it has served. Writes go to the store
+    first and the cache takes the session it returns; listings and message pages always
+    read the store.
+
+    Hits are served without asking the store. Each worker caches separately, so an entry
+    may miss turns another worker saved; those writes bumped the session version, so the
+    next save from this worker raises SessionConflict, which drops the entry and makes
+    the next read load the session again.
+    """
+
+    def __init__(self, store, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: float = 900.0):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _lookup(self, session_id: str, field: Optional[str] = None, start: int = 0) -> Optional[_Entry]:
+        """
+        The live entry of a session, if any; with field ("session", or "messages" from
+        index start on), counts a hit when the entry holds it and a miss otherwise
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and now - entry.last_used > self.ttl_seconds:
+                self._drop(session_id)
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                entry.last_used = now
+                self._entries.move_to_end(session_id)
+            if field is not None:
+                if entry is not None and getattr(entry, field) is not None and (field == "session" or entry.start <= start):
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            return entry
+
+    def _put(self, session_id: str, session: Optional[Dict], messages: Optional[List[Dict]], version: int, start: int = 0):
+        entry = _Entry(session, messages, version, start)
+        with self._lock:
+            current = self._entries.get(session_id)
+            if current is not None and current.version > version:
+                # A concurrent write already cached something newer
+                return
+            if current is not None:
+                self._drop(session_id)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[session_id] = entry
+            self._bytes += entry.size
+
+            now = time.monotonic()
+            # Least recently used first, so idle entries are always at the front
+            while self._entries:
+                oldest_id, oldest = next(iter(self._entries.items()))
+                if now - oldest.last_used > self.ttl_seconds:
+                    self.expirations += 1
+                elif self._bytes > self.max_bytes:
+                    self.evictions += 1
+                else:
+                    break
+                self._drop(oldest_id)
+
+    def _drop(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        entry = self._lookup(session_id, "session")
+        if entry is not None and entry.session is not None:
+            return dict(entry.session)
+        session = self.store.get_session(session_id)
+        if session is not None:
+            if entry is not None and entry.version == session.get("version", 0):
+                self._put(session_id, session, entry.messages, entry.version, entry.start)
+            else:
+                self._put(session_id, session, None, session.get("version", 0))
+        return session
+
+    def get_history(self, session_id: str, start: int = 0) -> Tuple[List[Dict], int]:
+        entry = self._lookup(session_id, "messages", start)
+        if entry is not None and entry.messages is not None and entry.start <= start:
+            return entry.messages[start - entry.start:], entry.version
+        messages, version = self.store.get_history(session_id, start)
+        if version:
+            session = entry.session if entry is not None and entry.version == version else None
+            self._put(session_id, session, messages, version, start)
+        return list(messages), version
+
+    def get_version(self, session_id: str) -> int:
+        entry = self._lookup(session_id)
+        return entry.version if entry is not None else self.store.get_version(session_id)
+
+    def get_messages(self, session_id: str) -> List[Dict]:
+        return self.get_history(session_id)[0]
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        return self.store.list_sessions(limit, cursor)
+
+    def get_messages_page(self, session_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        return self.store.get_messages_page(session_id, limit, cursor)
+
+    def create_session(self, session_id: str, conversation_id: Optional[str] = None, title: Optional[str] = None):
+        self.invalidate(session_id)
+        self.store.create_session(session_id, conversation_id, title)
+
+    def save_messages(self, session_id: str, messages: List[Dict], expected_version: Optional[int] = None, start: int = 0) -> Dict:
+        entry = self._lookup(session_id)
+        try:
+            session = self.store.save_messages(session_id, messages, expected_version, start)
+        except SessionConflict:
+            self.invalidate(session_id)
+            raise
+        saved, first = _normalized(messages), start
+        if start and entry is not None and entry.messages is not None and entry.start <= start <= entry.start + len(entry.messages):
+            # Keep the cached messages before start, which the caller did not send
+            saved, first = entry.messages[: start - entry.start] + saved, entry.start
+        self._put(session_id, session, saved, session["version"], first)
+        return session
+
+    def append_messages(self, session_id: str, new_messages: List[Dict]) -> Dict:
+        entry = self._lookup(session_id)
+        session = self.store.append_messages(session_id, new_messages)
+        messages = None
+        start = 0
+        if entry is not None and entry.messages is not None and entry.start + len(entry.messages) + len(new_messages) == session["message_count"]:
+            messages, start = entry.messages + _normalized(new_messages), entry.start
+        self._put(session_id, session, messages, session["version"], start)
+        return session
+
+    def save_summary(self, session_id: str, summary: str, summary_upto: int) -> bool:
+        saved = self.store.save_summary(session_id, summary, summary_upto)
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.session is not None:
+                if saved:
+                    entry.session = {**entry.session, "summary": summary, "summary_upto": summary_upto}
+                else:
+                    # Another worker's summary won; read it on next use
+                    entry.session = None
+        return saved
+
+    def delete_session(self, session_id: str) -> bool:
+        self.invalidate(session_id)
+        return self.store.delete_session(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,343 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.custom_logging import custom_logger
+from app.utils.pagination import decode_cursor, encode_cursor
+
+log = custom_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    conversation_id TEXT,
+    title TEXT NOT NULL DEFAULT 'New Chat',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    summary_upto INTEGER NOT NULL DEFAULT 0
+);
+DROP INDEX IF EXISTS sessions_updated_at;
+CREATE INDEX IF NOT EXISTS sessions_updated_at_id ON sessions (updated_at, session_id);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Columns added to sessions after its first release, with their definitions
+ADDED_COLUMNS = {
+    "version": "INTEGER NOT NULL DEFAULT 0",
+    "summary": "TEXT",
+    "summary_upto": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+class SessionConflict(Exception):
+    """A session was written by someone else since the caller read it"""
+
+
+def make_title(text: Optional[str]) -> str:
+    if not text:
+        return "New Chat"
+    return text[:50] + "..." if len(text) > 50 else text
+
+
+class SessionStore:
+    """
+    Chat sessions in SQLite (WAL mode): one row per session, one row per message.
+
+    A chat turn appends its new messages and bumps the session row in one transaction,
+    so its cost does not grow with the number of stored sessions or messages, and a
+    crash leaves either the whole turn or none of it. WAL lets requests read while a
+    turn is being written.
+
+    The database file is safe to share between worker processes on one host: writes
+    take SQLite's file lock, and every session carries a version bumped on each write
+    so a caller can detect that another worker changed it in between (SessionConflict).
+    """
+
+    def __init__(self, path: str, legacy_metadata_file: Optional[str] = None):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._add_columns()
+        if legacy_metadata_file:
+            self._migrate_legacy(legacy_metadata_file)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections must not be shared across threads"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL never corrupts the database; a power cut may only drop the last turns
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self):
+        """Transaction that takes the write lock up front, so concurrent writers queue instead of deadlocking"""
+        return _Transaction(self._conn(), "BEGIN IMMEDIATE")
+
+    def _read(self):
+        """Transaction giving several reads one consistent view"""
+        return _Transaction(self._conn(), "BEGIN")
+
+    def _add_columns(self):
+        """Databases created before sessions had these columns get them (once, whichever worker comes first)"""
+        with self._write() as conn:
+            columns = [r["name"] for r in conn.execute("PRAGMA table_info(sessions)").fetchall()]
+            for name, definition in ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE sessions ADD COLUMN {name} {definition}")
+
+    def _migrate_legacy(self, metadata_file: str):
+        """Import sessions/_metadata.json from the old whole-file store once, then set it aside"""
+        if not os.path.exists(metadata_file):
+            return
+
+        now = datetime.utcnow().isoformat()
+        # Workers starting together all get here; the write lock lets one import while the
+        # others wait, then find the file gone
+        with self._write() as conn:
+            try:
+                with open(metadata_file, "r") as f:
+                    metadata = json.load(f)
+            except FileNotFoundError:
+                return
+            except Exception as e:
+                log.warning(f"Could not read legacy session metadata: {e}")
+                return
+
+            for session_id, meta in metadata.items():
+                messages = meta.get("messages") or []
+                conn.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, conversation_id, title, created_at, updated_at, message_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        session_id,
+                        meta.get("conversation_id"),
+                        meta.get("title") or "New Chat",
+                        meta.get("created_at") or now,
+                        meta.get("updated_at") or now,
+                        len(messages),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, seq, m.get("role", "user"), str(m.get("content", ""))) for seq, m in enumerate(messages)],
+                )
+            os.replace(metadata_file, metadata_file + ".migrated")
+        log.info(f"Migrated {len(metadata)} sessions from {metadata_file}")
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_sessions(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Sessions, most recently updated first, read from the (updated_at, session_id) index
+        without touching messages; returns (page, cursor of the next page or None)
+        """
+        sql = "SELECT session_id, title, created_at, updated_at, message_count, version FROM sessions"
+        params: list = []
+        after = decode_cursor(cursor)
+        if after:
+            sql += " WHERE updated_at < ? OR (updated_at = ? AND session_id < ?)"
+            params += [after[0], after[0], after[1]]
+        sql += " ORDER BY updated_at DESC, session_id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit + 1)
+
+        sessions = [dict(r) for r in self._conn().execute(sql, params).fetchall()]
+        if limit and len(sessions) > limit:
+            sessions = sessions[:limit]
+            last = sessions[-1]
+            return sessions, encode_cursor(last["updated_at"], last["session_id"])
+        return sessions, None
+
+    def get_version(self, session_id: str) -> int:
+        """Current version of a session (0 when missing), read without its messages"""
+        row = self._conn().execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row["version"] if row else 0
+
+    def get_messages(self, session_id: str) -> List[Dict]:
+        return self.get_messages_page(session_id)[0]
+
+    def get_history(self, session_id: str, start: int = 0) -> Tuple[List[Dict], int]:
+        """
+        The messages of a session from index start on and the version they were read at
+        (0 for a missing session)
+        """
+        with self._read() as conn:
+            row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            rows = conn.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq", (session_id, start)
+            ).fetchall()
+        return [{"role": r["role"], "content": r["content"]} for r in rows], row["version"] if row else 0
+
+    def get_messages_page(self, session_id: str, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        The latest limit messages of a session before the cursor (all when no limit), in
+        chat order; returns (page, cursor of the next older page or None)
+        """
+        before = decode_cursor(cursor)
+        sql = "SELECT seq, role, content FROM messages WHERE session_id = ?"
+        params: list = [session_id]
+        if before:
+            sql += " AND seq < ?"
+            params.append(before[0])
+        sql += " ORDER BY seq DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        rows = self._conn().execute(sql, params).fetchall()[::-1]
+        messages = [{"role": r["role"], "content": r["content"]} for r in rows]
+        if limit and rows and rows[0]["seq"] > 0:
+            return messages, encode_cursor(rows[0]["seq"])
+        return messages, None
+
+    def create_session(self, session_id: str, conversation_id: Optional[str] = None, title: Optional[str] = None):
+        """Create (or reset) a session with no messages"""
+        now = datetime.utcnow().isoformat()
+        with self._write() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, conversation_id, title, created_at, updated_at, message_count, version) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (session_id, conversation_id, title or "New Chat", now, now, (row["version"] if row else 0) + 1),
+            )
+
+    def save_messages(self, session_id: str, messages: List[Dict], expected_version: Optional[int] = None, start: int = 0) -> Dict:
+        """
+        Store the message list of a session from index start on (the whole list by
+        default), creating the session if needed; returns the session as get_session
+        would after the write. When the list extends what is stored (the usual chat turn)
+        only the new tail is inserted; a list that diverges replaces the stored messages
+        from start on. With expected_version, raises SessionConflict unless the session is
+        still at it.
+        """
+        now = datetime.utcnow().isoformat()
+        with self._write() as conn:
+            row = conn.execute("SELECT message_count, title, version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            if expected_version is not None and (row["version"] if row else 0) != expected_version:
+                raise SessionConflict(f"Session {session_id} changed since version {expected_version}")
+            if row is None:
+                conn.execute(
+                    "INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)", (session_id, now, now)
+                )
+                stored, title = 0, "New Chat"
+            else:
+                stored, title = row["message_count"], row["title"]
+            if stored < start:
+                raise SessionConflict(f"Session {session_id} has {stored} messages, fewer than {start}")
+
+            total = start + len(messages)
+            first = stored
+            if stored > total or (
+                stored > start and not self._same_message(conn, session_id, stored - 1, messages[stored - 1 - start])
+            ):
+                conn.execute("DELETE FROM messages WHERE session_id = ? AND seq >= ?", (session_id, start))
+                # A summary reaching into the replaced messages described them
+                conn.execute(
+                    "UPDATE sessions SET summary = NULL, summary_upto = 0 WHERE session_id = ? AND summary_upto > ?",
+                    (session_id, start),
+                )
+                first = start
+
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [
+                    (session_id, seq, m.get("role", "user"), str(m.get("content", "")))
+                    for seq, m in enumerate(messages[first - start:], start=first)
+                ],
+            )
+
+            if not title or title == "New Chat":
+                first_user = next((m for m in messages if m.get("role") == "user"), None)
+                if first_user:
+                    title = make_title(first_user.get("content", ""))
+            conn.execute(
+                "UPDATE sessions SET message_count = ?, title = ?, updated_at = ?, version = version + 1 WHERE session_id = ?",
+                (total, title or "New Chat", now, session_id),
+            )
+            return self._session_row(conn, session_id)
+
+    def append_messages(self, session_id: str, new_messages: List[Dict]) -> Dict:
+        """Append messages after whatever the session holds now (creating it if needed); returns the session"""
+        now = datetime.utcnow().isoformat()
+        with self._write() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?)", (session_id, now, now)
+            )
+            stored = conn.execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                [
+                    (session_id, seq, m.get("role", "user"), str(m.get("content", "")))
+                    for seq, m in enumerate(new_messages, start=stored)
+                ],
+            )
+            conn.execute(
+                "UPDATE sessions SET message_count = ?, updated_at = ?, version = version + 1 WHERE session_id = ?",
+                (stored + len(new_messages), now, session_id),
+            )
+            return self._session_row(conn, session_id)
+
+    def save_summary(self, session_id: str, summary: str, summary_upto: int) -> bool:
+        """
+        Store the summary of a session's first summary_upto messages unless it already has
+        one reaching as far; the version is left alone since the messages did not change
+        """
+        with self._write() as conn:
+            updated = conn.execute(
+                "UPDATE sessions SET summary = ?, summary_upto = ? WHERE session_id = ? AND summary_upto < ? AND message_count >= ?",
+                (summary, summary_upto, session_id, summary_upto, summary_upto),
+            ).rowcount
+        return updated > 0
+
+    @staticmethod
+    def _session_row(conn: sqlite3.Connection, session_id: str) -> Dict:
+        return dict(conn.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,)).fetchone())
+
+    @staticmethod
+    def _same_message(conn: sqlite3.Connection, session_id: str, seq: int, message: Dict) -> bool:
+        row = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? AND seq = ?", (session_id, seq)
+        ).fetchone()
+        return row is not None and row["role"] == message.get("role", "user") and row["content"] == str(message.get("content", ""))
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._write() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            deleted = conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount
+        return deleted > 0
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, begin: str):
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
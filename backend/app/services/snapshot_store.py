@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import shutil
+import uuid
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.utils.config import DATA_SNAPSHOT_DIR
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+
+def _is_text_column(series: pd.Series) -> bool:
+    return series.dtype == object and series.map(lambda v: v is None or isinstance(v, str) or v != v).all()
+
+
+class SnapshotStore:
+    """
+    On-disk columnar snapshots of the datasets held in MongoDB.
+
+    Every column is saved as its own .npy file (numbers and dates natively, text as a
+    fixed-width unicode array plus a null mask) so a snapshot opens memory-mapped with
+    no parsing. A snapshot is only served while its stamp (the updated_at / row_count
+    MongoDB reports for the dataset) still matches.
+
+    Layout: <root>/<name>.json points at the current <root>/<name>.<token>/ directory;
+    the pointer is replaced atomically, so readers never see a half-written snapshot.
+    """
+
+    def __init__(self, root: str = DATA_SNAPSHOT_DIR):
+        self.root = root
+
+    def _safe_name(self, file_name: str) -> str:
+        return re.sub(r"[^A-Za-z0-9._-]", "_", file_name)
+
+    def _pointer_path(self, file_name: str) -> str:
+        return os.path.join(self.root, f"{self._safe_name(file_name)}.json")
+
+    def _read_pointer(self, file_name: str) -> Optional[Dict]:
+        try:
+            with open(self._pointer_path(file_name), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, file_name: str, stamp: Optional[Dict], allow_stale: bool = False) -> Optional[pd.DataFrame]:
+        """The snapshot of file_name if it matches stamp (or any snapshot when allow_stale)"""
+        meta = self._read_pointer(file_name)
+        if meta is None:
+            return None
+        if not allow_stale and meta.get("stamp") != stamp:
+            return None
+
+        try:
+            directory = os.path.join(self.root, meta["directory"])
+            data = {}
+            for column in meta["columns"]:
+                path = os.path.join(directory, column["file"])
+                if column["kind"] == "text":
+                    values = np.load(path, mmap_mode="r").astype(object)
+                    nulls = np.load(os.path.join(directory, column["nulls"]))
+                    values[nulls] = None
+                elif column["kind"] == "object":
+                    values = np.load(path, allow_pickle=True)
+                else:
+                    values = np.load(path, mmap_mode="r")
+                data[column["name"]] = values
+            df = pd.DataFrame(data, columns=[c["name"] for c in meta["columns"]])
+        except Exception as e:
+            log.warning(f"Ignoring unreadable snapshot of {file_name}: {e}")
+            return None
+
+        if len(df) != meta.get("row_count"):
+            return None
+        return df
+
+    def save(self, file_name: str, df: pd.DataFrame, stamp: Dict) -> bool:
+        token = uuid.uuid4().hex[:12]
+        directory_name = f"{self._safe_name(file_name)}.{token}"
+        directory = os.path.join(self.root, directory_name)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            columns = []
+            for position, name in enumerate(df.columns):
+                series = df[name]
+                column = {"name": str(name), "file": f"{position}.npy"}
+                if series.dtype != object:
+                    column["kind"] = "native"
+                    np.save(os.path.join(directory, column["file"]), series.to_numpy())
+                elif _is_text_column(series):
+                    column["kind"] = "text"
+                    column["nulls"] = f"{position}.nulls.npy"
+                    nulls = series.isna().to_numpy()
+                    np.save(os.path.join(directory, column["file"]), series.fillna("").to_numpy(dtype=str))
+                    np.save(os.path.join(directory, column["nulls"]), nulls)
+                else:
+                    # Mixed-type column: keep exact values, loaded eagerly instead of memory-mapped
+                    column["kind"] = "object"
+                    np.save(os.path.join(directory, column["file"]), series.to_numpy(), allow_pickle=True)
+                columns.append(column)
+
+            previous = self._read_pointer(file_name)
+            meta = {
+                "file_name": file_name,
+                "directory": directory_name,
+                "row_count": len(df),
+                "stamp": stamp,
+                "columns": columns,
+            }
+            tmp_path = f"{self._pointer_path(file_name)}.{token}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+            os.replace(tmp_path, self._pointer_path(file_name))
+
+            if previous and previous.get("directory") != directory_name:
+                shutil.rmtree(os.path.join(self.root, previous["directory"]), ignore_errors=True)
+            log.info(f"Saved snapshot of {file_name} ({len(df)} rows)")
+            return True
+        except Exception as e:
+            log.warning(f"Could not save snapshot of {file_name}: {e}")
+            shutil.rmtree(directory, ignore_errors=True)
+            return False
@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.config import SESSION_BACKEND, SESSION_DB_PATH, STREAM_REPLAY_EVENTS, STREAM_RETENTION
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+Event = Tuple[int, str, Dict]
+
+# Seconds a turn that never finished (its worker died) stays readable
+ABANDONED_AFTER = 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turn_streams (
+    stream_id TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turn_stream_events (
+    stream_id TEXT NOT NULL,
+    event_id INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (stream_id, event_id)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStreamStore:
+    """
+    Events of running and recent chat turns in the sessions SQLite file, so any worker
+    on the host can replay and follow a turn another worker runs.
+
+    Each turn keeps its latest max_events events. Finished turns are deleted retention
+    seconds after they ended, and turns whose worker died ABANDONED_AFTER seconds after
+    their last event.
+    """
+
+    def __init__(self, path: str, max_events: int = STREAM_REPLAY_EVENTS, retention: float = STREAM_RETENTION):
+        self.path = path
+        self.max_events = max_events
+        self.retention = retention
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def start(self, stream_id: str, session_id: str):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._prune(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO turn_streams (stream_id, session_id, done, updated_at) VALUES (?, ?, 0, ?)",
+                (stream_id, session_id, time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def append(self, stream_id: str, events: List[Event], done: bool = False):
+        """Store a batch of a turn's events, marking the turn finished with done"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO turn_stream_events (stream_id, event_id, event, data) VALUES (?, ?, ?, ?)",
+                [(stream_id, event_id, event, json.dumps(data, default=str)) for event_id, event, data in events],
+            )
+            if events:
+                conn.execute(
+                    "DELETE FROM turn_stream_events WHERE stream_id = ? AND event_id <= ?",
+                    (stream_id, events[-1][0] - self.max_events),
+                )
+            conn.execute(
+                "UPDATE turn_streams SET done = ?, updated_at = ? WHERE stream_id = ?", (int(done), time.time(), stream_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self, stream_id: str, after: int) -> Optional[Tuple[str, List[Event], Optional[int], bool]]:
+        """
+        (session_id, events after `after`, id of the oldest event kept, whether the turn
+        finished) of a stream, or None when it is unknown or gone
+        """
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT session_id, done FROM turn_streams WHERE stream_id = ?", (stream_id,)).fetchone()
+            if row is None:
+                return None
+            first = conn.execute("SELECT MIN(event_id) FROM turn_stream_events WHERE stream_id = ?", (stream_id,)).fetchone()[0]
+            rows = conn.execute(
+                "SELECT event_id, event, data FROM turn_stream_events WHERE stream_id = ? AND event_id > ? ORDER BY event_id",
+                (stream_id, after),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return row[0], [(r[0], r[1], json.loads(r[2])) for r in rows], first, bool(row[1])
+
+    def _prune(self, conn: sqlite3.Connection):
+        now = time.time()
+        stale = "SELECT stream_id FROM turn_streams WHERE (done = 1 AND updated_at < ?) OR updated_at < ?"
+        params = (now - self.retention, now - ABANDONED_AFTER)
+        conn.execute(f"DELETE FROM turn_stream_events WHERE stream_id IN ({stale})", params)
+        conn.execute(f"DELETE FROM turn_streams WHERE stream_id IN ({stale})", params)
+
+
+class MongoStreamStore:
+    """
+    SQLiteStreamStore on MongoDB, for workers on several hosts: turn_streams and
+    turn_stream_events collections whose documents TTL indexes delete once expired
+    """
+
+    def __init__(self, max_events: int = STREAM_REPLAY_EVENTS, retention: float = STREAM_RETENTION):
+        from app.services.mongodb_service import mongodb_service
+
+        if mongodb_service.db is None:
+            raise RuntimeError("MongoDB not available for turn streams")
+        self.max_events = max_events
+        self.retention = retention
+        self.streams = mongodb_service.db.turn_streams
+        self.events = mongodb_service.db.turn_stream_events
+        self.streams.create_index("stream_id", unique=True)
+        self.streams.create_index("expires_at", expireAfterSeconds=0)
+        self.events.create_index([("stream_id", 1), ("event_id", 1)], unique=True)
+        self.events.create_index("expires_at", expireAfterSeconds=0)
+
+    def _expiry(self, done: bool) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.retention if done else ABANDONED_AFTER)
+
+    def start(self, stream_id: str, session_id: str):
+        self.streams.replace_one(
+            {"stream_id": stream_id},
+            {"stream_id": stream_id, "session_id": session_id, "done": False, "expires_at": self._expiry(False)},
+            upsert=True,
+        )
+
+    def append(self, stream_id: str, events: List[Event], done: bool = False):
+        expires_at = self._expiry(done)
+        if events:
+            self.events.insert_many(
+                [
+                    {"stream_id": stream_id, "event_id": event_id, "event": event, "data": json.loads(json.dumps(data, default=str)), "expires_at": expires_at}
+                    for event_id, event, data in events
+                ],
+                ordered=False,
+            )
+            self.events.delete_many({"stream_id": stream_id, "event_id": {"$lte": events[-1][0] - self.max_events}})
+        if done:
+            self.events.update_many({"stream_id": stream_id}, {"$set": {"expires_at": expires_at}})
+        self.streams.update_one({"stream_id": stream_id}, {"$set": {"done": done, "expires_at": expires_at}})
+
+    def read(self, stream_id: str, after: int) -> Optional[Tuple[str, List[Event], Optional[int], bool]]:
+        stream = self.streams.find_one({"stream_id": stream_id})
+        if stream is None or stream["expires_at"] < datetime.utcnow():
+            return None
+        first = self.events.find_one({"stream_id": stream_id}, {"event_id": 1}, sort=[("event_id", 1)])
+        docs = self.events.find({"stream_id": stream_id, "event_id": {"$gt": after}}, sort=[("event_id", 1)])
+        events = [(doc["event_id"], doc["event"], doc["data"]) for doc in docs]
+        return stream["session_id"], events, first["event_id"] if first else None, stream["done"]
+
+
+def create_stream_store():
+    """The turn event store next to the sessions (SESSION_BACKEND), or None if unavailable"""
+    try:
+        if SESSION_BACKEND.lower() == "mongodb":
+            try:
+                return MongoStreamStore()
+            except Exception as e:
+                log.warning(f"MongoDB turn streams unavailable, using SQLite: {e}")
+        return SQLiteStreamStore(SESSION_DB_PATH)
+    except Exception as e:
+        log.warning(f"Turn streams are not shared between workers: {e}")
+        return None
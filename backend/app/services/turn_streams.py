@@ -0,0 +1,222 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from app.services.stream_store import create_stream_store
+from app.utils.config import SSE_HEARTBEAT_INTERVAL, STREAM_POLL_INTERVAL, STREAM_REPLAY_EVENTS, STREAM_RETENTION
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+Event = Tuple[int, str, Dict]
+
+REPLAY_EXPIRED = (None, "error", {"code": "replay_expired", "message": "Events were dropped from the replay buffer; reload the session"})
+
+
+def format_sse(event_id: Optional[int], event: str, data: Dict) -> str:
+    """One Server-Sent Events message"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class TurnStream:
+    """
+    The events of one chat turn, numbered from 1, with the latest max_events kept for
+    replay. Any number of clients can follow it, each from the last event id it saw.
+    """
+
+    def __init__(self, stream_id: str, session_id: str, max_events: int = STREAM_REPLAY_EVENTS):
+        self.id = stream_id
+        self.session_id = session_id
+        self.events: deque = deque(maxlen=max_events)
+        self.last_id = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, event: str, data: Dict):
+        async with self._changed:
+            self.last_id += 1
+            self.events.append((self.last_id, event, data))
+            self._changed.notify_all()
+
+    async def close(self):
+        async with self._changed:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    async def follow(self, after: int = 0, heartbeat: float = SSE_HEARTBEAT_INTERVAL) -> AsyncIterator[Optional[Event]]:
+        """
+        Events with ids after `after`, live until the turn ends; yields None after each
+        heartbeat interval without events. If events after `after` were already dropped
+        from the buffer, yields a single replay_expired error instead.
+        """
+        while True:
+            async with self._changed:
+                if not self._pending(after) and not self.done:
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        pass
+                expired = bool(self.events) and after < self.events[0][0] - 1
+                pending = self._pending(after)
+                done = self.done
+
+            if expired:
+                yield REPLAY_EXPIRED
+                return
+            for item in pending:
+                yield item
+                after = item[0]
+            if not pending:
+                if done:
+                    return
+                yield None
+
+    def _pending(self, after: int):
+        return [item for item in self.events if item[0] > after]
+
+
+class StoredTurnStream:
+    """A turn run by another worker, followed by polling the shared stream store"""
+
+    def __init__(self, stream_id: str, session_id: str, store, poll_interval: float = STREAM_POLL_INTERVAL):
+        self.id = stream_id
+        self.session_id = session_id
+        self.store = store
+        self.poll_interval = poll_interval
+
+    async def follow(self, after: int = 0, heartbeat: float = SSE_HEARTBEAT_INTERVAL) -> AsyncIterator[Optional[Event]]:
+        """Same contract as TurnStream.follow; a turn that vanishes from the store ends with an error"""
+        idle_since = time.monotonic()
+        while True:
+            state = await asyncio.to_thread(self.store.read, self.id, after)
+            if state is None:
+                yield (None, "error", {"code": "stream_gone", "message": "The turn is no longer available; reload the session"})
+                return
+            _, events, first, done = state
+            if first is not None and after < first - 1:
+                yield REPLAY_EXPIRED
+                return
+            for item in events:
+                yield item
+                after = item[0]
+            if events:
+                idle_since = time.monotonic()
+            elif done:
+                return
+            elif time.monotonic() - idle_since >= heartbeat:
+                idle_since = time.monotonic()
+                yield None
+            if not done:
+                await asyncio.sleep(self.poll_interval)
+
+
+class TurnStreams:
+    """
+    Chat turns running in the background of this worker, by stream id.
+
+    A turn keeps running when its client disconnects, and stays available for resuming
+    until `retention` seconds after it finished. Its events are also written to the
+    shared stream store (next to the sessions), so a resume that reaches another worker
+    follows the turn from there; only without a store are streams local to their worker.
+    """
+
+    def __init__(self, retention: float = STREAM_RETENTION, store=None):
+        self.retention = retention
+        self.store = store
+        self._streams: Dict[str, TurnStream] = {}
+        self._tasks = set()
+
+    def _prune(self):
+        now = time.monotonic()
+        for stream_id, stream in list(self._streams.items()):
+            if stream.done and now - stream.finished_at > self.retention:
+                del self._streams[stream_id]
+
+    def get(self, stream_id: str) -> Optional[TurnStream]:
+        self._prune()
+        return self._streams.get(stream_id)
+
+    async def find(self, stream_id: str):
+        """The stream, run here or (through the store) by another worker, or None"""
+        stream = self.get(stream_id)
+        if stream is not None or self.store is None:
+            return stream
+        try:
+            state = await asyncio.to_thread(self.store.read, stream_id, 0)
+        except Exception as e:
+            log.error(f"Could not look up turn stream {stream_id}: {e}")
+            return None
+        return StoredTurnStream(stream_id, state[0], self.store) if state is not None else None
+
+    def start(self, stream_id: str, session_id: str, events: AsyncIterator[Tuple[str, Dict]]) -> TurnStream:
+        """Run a turn's event generator in the background, publishing into a new stream"""
+        self._prune()
+        stream = TurnStream(stream_id, session_id)
+        self._streams[stream_id] = stream
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(self._pump(stream, events))]
+        if self.store is not None:
+            tasks.append(loop.create_task(self._persist(stream)))
+        for task in tasks:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return stream
+
+    async def _pump(self, stream: TurnStream, events: AsyncIterator[Tuple[str, Dict]]):
+        try:
+            await stream.publish("start", {"stream_id": stream.id, "session_id": stream.session_id})
+            async for event, data in events:
+                await stream.publish(event, data)
+        except Exception as e:
+            log.error(f"Turn stream {stream.id} failed: {e}")
+            await stream.publish("error", {"message": str(e)})
+        finally:
+            await stream.close()
+
+    async def _persist(self, stream: TurnStream):
+        """Copy a stream's events to the store, a batch per write, as they are published"""
+        saved = 0
+        try:
+            await asyncio.to_thread(self.store.start, stream.id, stream.session_id)
+            while True:
+                async with stream._changed:
+                    while stream.last_id == saved and not stream.done:
+                        await stream._changed.wait()
+                    batch = stream._pending(saved)
+                    done = stream.done
+                if batch or done:
+                    await asyncio.to_thread(self.store.append, stream.id, batch, done)
+                if batch:
+                    saved = batch[-1][0]
+                if done and saved == stream.last_id:
+                    return
+        except Exception as e:
+            log.error(f"Could not store turn stream {stream.id}; it can only be resumed on this worker: {e}")
+
+    async def sse(self, stream, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """A stream as SSE text, resuming after last_event_id; heartbeats are comment lines"""
+        try:
+            after = int(last_event_id) if last_event_id else 0
+        except ValueError:
+            after = 0
+        async for item in stream.follow(after):
+            if item is None:
+                yield ": heartbeat\n\n"
+            else:
+                yield format_sse(*item)
+
+    def stats(self) -> Dict:
+        self._prune()
+        return {
+            "streams": len(self._streams),
+            "running": len(self._tasks),
+            "store": type(self.store).__name__ if self.store is not None else None,
+        }
+
+
+turn_streams = TurnStreams(store=create_stream_store())
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.services.search_index import tokenize
+from app.utils.config import EMBEDDING_MODEL, OPENAI_API_KEY, SUPPORT_EMBEDDER
+from app.utils.custom_logging import custom_logger
+
+log = custom_logger()
+
+VECTOR_INDEX_DIR = os.path.join(os.path.dirname(__file__), "../../data/support/support_vector_index")
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """
+    Deterministic feature-hashing embedder.
+
+    Needs no network or model, so it is used for offline runs and tests. Its vectors
+    live in their own space, so documents are re-embedded with it instead of reusing
+    the stored OpenAI embeddings.
+    """
+
+    name = "hashing"
+    uses_stored_embeddings = False
+    # Vectors are hashed bags of words: close for shared words, not for shared meaning
+    semantic = False
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in tokenize(text):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if (digest >> 63) & 1 else -1.0
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return np.vstack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._embed(text)
+
+
+class OpenAIEmbedder:
+    """Query embedder matching the model the shipped support_vector_index was built with"""
+
+    name = "openai"
+    uses_stored_embeddings = True
+    semantic = True
+
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        self.model = model
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            if not OPENAI_API_KEY:
+                raise RuntimeError("No API key found. Set OPENAI_API_KEY in .env")
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=OPENAI_API_KEY)
+        return self._client
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        response = self._get_client().embeddings.create(model=self.model, input=texts)
+        return np.asarray([d.embedding for d in response.data], dtype=np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embed_documents([text])[0]
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    OpenAIEmbedder.name: OpenAIEmbedder,
+}
+
+
+def get_embedder(name: str = SUPPORT_EMBEDDER):
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}'. Available: {', '.join(EMBEDDERS)}")
+    return EMBEDDERS[name]()
+
+
+class VectorIndex:
+    """
+    Dense top-k search over the LlamaIndex-style support_vector_index.
+
+    The embeddings are parsed from default__vector_store.json once, normalized into a
+    contiguous float32 matrix and persisted next to the index as <embedder>_embeddings.npy,
+    which later boots open memory-mapped. The cache is rebuilt whenever the JSON files
+    are newer than it.
+    """
+
+    def __init__(self, embedder, index_dir: str = VECTOR_INDEX_DIR):
+        self.embedder = embedder
+        self.index_dir = index_dir
+        self.doc_ids: List[str] = []
+        self.texts: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @property
+    def _vector_store_path(self) -> str:
+        return os.path.join(self.index_dir, "default__vector_store.json")
+
+    @property
+    def _docstore_path(self) -> str:
+        return os.path.join(self.index_dir, "docstore.json")
+
+    @property
+    def _cache_path(self) -> str:
+        return os.path.join(self.index_dir, f"{self.embedder.name}_embeddings.npy")
+
+    @property
+    def _ids_path(self) -> str:
+        return os.path.join(self.index_dir, f"{self.embedder.name}_embeddings_ids.json")
+
+    def _cache_is_fresh(self) -> bool:
+        if not (os.path.exists(self._cache_path) and os.path.exists(self._ids_path)):
+            return False
+        cache_mtime = os.path.getmtime(self._cache_path)
+        return all(
+            os.path.getmtime(p) <= cache_mtime for p in (self._vector_store_path, self._docstore_path)
+        )
+
+    def _load_docstore(self):
+        with open(self._docstore_path, "r") as f:
+            docs = json.load(f).get("docstore/data", {})
+        return {doc_id: doc.get("__data__", {}).get("text", "") for doc_id, doc in docs.items()}
+
+    def _build_matrix(self, texts_by_id) -> Tuple[List[str], np.ndarray]:
+        if self.embedder.uses_stored_embeddings:
+            with open(self._vector_store_path, "r") as f:
+                embedding_dict = json.load(f).get("embedding_dict", {})
+            doc_ids = [doc_id for doc_id in embedding_dict if doc_id in texts_by_id]
+            matrix = np.asarray([embedding_dict[doc_id] for doc_id in doc_ids], dtype=np.float32)
+        else:
+            doc_ids = list(texts_by_id)
+            matrix = self.embedder.embed_documents([texts_by_id[doc_id] for doc_id in doc_ids])
+        return doc_ids, np.ascontiguousarray(normalize_rows(matrix))
+
+    def load(self) -> "VectorIndex":
+        with self._lock:
+            if self.matrix is not None:
+                return self
+
+            texts_by_id = self._load_docstore()
+            if self._cache_is_fresh():
+                with open(self._ids_path, "r") as f:
+                    doc_ids = json.load(f)
+                matrix = np.load(self._cache_path, mmap_mode="r")
+                log.info(f"Loaded support vectors from {self._cache_path}: {matrix.shape}")
+            else:
+                doc_ids, matrix = self._build_matrix(texts_by_id)
+                try:
+                    # Written under temporary names and renamed, since other workers may be reading the cache
+                    tmp_suffix = f".{os.getpid()}.tmp"
+                    with open(self._ids_path + tmp_suffix, "w") as f:
+                        json.dump(doc_ids, f)
+                    with open(self._cache_path + tmp_suffix, "wb") as f:
+                        np.save(f, matrix)
+                    os.replace(self._ids_path + tmp_suffix, self._ids_path)
+                    os.replace(self._cache_path + tmp_suffix, self._cache_path)
+                    matrix = np.load(self._cache_path, mmap_mode="r")
+                except OSError as e:
+                    log.warning(f"Could not persist support vectors, keeping them in memory: {e}")
+                log.info(f"Built support vectors with {self.embedder.name} embedder: {matrix.shape}")
+
+            self.doc_ids = doc_ids
+            self.texts = [texts_by_id.get(doc_id, "") for doc_id in doc_ids]
+            self.matrix = matrix
+            return self
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float, str]]:
+        """(doc_id, cosine score, text) of the k nearest documents, best first"""
+        self.load()
+        if self.matrix.shape[0] == 0:
+            return []
+
+        query_vector = normalize_rows(np.asarray(self.embedder.embed_query(query), dtype=np.float32))
+        scores = self.matrix @ query_vector
+
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i]), self.texts[i]) for i in top]
@@ -7,9 +7,140 @@ try:
     # For local testing, MongoDB is optional - will use in-memory storage
     MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
     MONGODB_DB = os.getenv("MONGODB_DB", "chatbot_db")
+    # Support retrieval: "bm25" (keyword relevance) or "vector" (dense search over support_vector_index)
+    SUPPORT_SEARCH_MODE = os.getenv("SUPPORT_SEARCH_MODE", "bm25")
+    # Query embedder for vector mode: "openai" (matches the shipped index) or "hashing" (offline)
+    SUPPORT_EMBEDDER = os.getenv("SUPPORT_EMBEDDER", "openai")
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+    # Output budget for search tool results fed back to the LLM
+    TOOL_RESULT_MAX_ROWS = int(os.getenv("TOOL_RESULT_MAX_ROWS", "40"))
+    TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "2000"))
+    # LRU/TTL cache of search tool results (0 entries disables it)
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+    # Rows per MongoDB batch document when storing CSV datasets
+    CSV_BATCH_SIZE = int(os.getenv("CSV_BATCH_SIZE", "1000"))
+    # Local columnar snapshots of the MongoDB datasets, reused across restarts while still fresh
+    DATA_SNAPSHOT_DIR = os.getenv(
+        "DATA_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "../../data/snapshots")
+    )
+    # Where chat sessions live: "sqlite" (one file shared by the workers of a host) or
+    # "mongodb" (shared by every host)
+    SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+    # SQLite (WAL) database holding chat sessions and their messages
+    SESSION_DB_PATH = os.getenv(
+        "SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), "../../sessions/sessions.db")
+    )
+    # Default and maximum page sizes of the /sessions and /sessions/{id}/messages listings
+    SESSION_PAGE_SIZE = int(os.getenv("SESSION_PAGE_SIZE", "50"))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+    # Memory budget (bytes, 0 disables) and idle timeout (seconds) of each worker's session cache
+    SESSION_CACHE_MAX_BYTES = int(os.getenv("SESSION_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "900"))
+    # Copying chat turns into OpenAI conversations: "background" (write-behind queue) or "off"
+    CONVERSATION_MIRROR = os.getenv("CONVERSATION_MIRROR", "background")
+    MIRROR_QUEUE_SIZE = int(os.getenv("MIRROR_QUEUE_SIZE", "1000"))
+    MIRROR_BATCH_SIZE = int(os.getenv("MIRROR_BATCH_SIZE", "10"))
+    MIRROR_MAX_RETRIES = int(os.getenv("MIRROR_MAX_RETRIES", "5"))
+    # Connection pool shared by all model calls: size, idle keep-alive (seconds) and timeouts
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+    LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    # Routing: "local" decides confident queries without the supervisor model call, "llm" always asks it
+    ROUTER_MODE = os.getenv("ROUTER_MODE", "local")
+    ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.9"))
+    # Streamed answer tokens are written out once this many chars or seconds have built up
+    STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "32"))
+    STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.05"))
+    # /chat-events: seconds between heartbeats, events kept per turn for Last-Event-ID
+    # resumes, and seconds a finished turn stays resumable
+    SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+    STREAM_REPLAY_EVENTS = int(os.getenv("STREAM_REPLAY_EVENTS", "1024"))
+    STREAM_RETENTION = float(os.getenv("STREAM_RETENTION", "120"))
+    # Seconds between reads of the shared stream store by a client following a turn
+    # that another worker runs
+    STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "0.25"))
+    # Threads running tool calls, and seconds a tool may take: TOOL_TIMEOUT, or per tool
+    # from TOOL_TIMEOUTS="search_accounting=10,aggregate_accounting=30"
+    TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+    TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+    TOOL_TIMEOUTS = {
+        name.strip(): float(seconds)
+        for name, _, seconds in (item.partition("=") for item in os.getenv("TOOL_TIMEOUTS", "").split(",") if item.strip())
+    }
+    # Token budget of the conversation context each graph node sends to the model
+    CONTEXT_BUDGETS = {
+        "supervisor": int(os.getenv("SUPERVISOR_CONTEXT_TOKENS", "400")),
+        "accounting": int(os.getenv("ACCOUNTING_CONTEXT_TOKENS", "3000")),
+        "support": int(os.getenv("SUPPORT_CONTEXT_TOKENS", "3000")),
+    }
+    # Once unsummarized history exceeds SUMMARY_TRIGGER_TOKENS, older turns are folded into
+    # the session summary until SUMMARY_KEEP_TOKENS of recent turns remain verbatim
+    SUMMARY_TRIGGER_TOKENS = int(os.getenv("SUMMARY_TRIGGER_TOKENS", "2000"))
+    SUMMARY_KEEP_TOKENS = int(os.getenv("SUMMARY_KEEP_TOKENS", "1000"))
+    # Final answers served again for repeated questions: routes cached (comma-separated,
+    # empty disables), entries kept and seconds an entry lives. Questions match on their
+    # exact content words; with a semantic ANSWER_CACHE_EMBEDDER ("openai") a differently
+    # worded question also matches at ANSWER_CACHE_THRESHOLD cosine similarity or above
+    ANSWER_CACHE_ROUTES = {r.strip() for r in os.getenv("ANSWER_CACHE_ROUTES", "support").split(",") if r.strip()}
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    ANSWER_CACHE_EMBEDDER = os.getenv("ANSWER_CACHE_EMBEDDER", "")
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+    # Files imported concurrently by migrate_to_mongodb.py
+    IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "4"))
+    # Seconds between checks of MongoDB for changed datasets (0 disables hot reload)
+    DATASET_POLL_INTERVAL = float(os.getenv("DATASET_POLL_INTERVAL", "30"))
 except Exception:
     OPENAI_API_KEY = None
     CHAT_MODEL = "gpt-4o-mini"
     MONGODB_URI = "mongodb://localhost:27017"  # Not used in local testing mode
     MONGODB_DB = "chatbot_db"  # Not used in local testing mode
+    SUPPORT_SEARCH_MODE = "bm25"
+    SUPPORT_EMBEDDER = "openai"
+    EMBEDDING_MODEL = "text-embedding-3-large"
+    TOOL_RESULT_MAX_ROWS = 40
+    TOOL_RESULT_MAX_TOKENS = 2000
+    SEARCH_CACHE_SIZE = 1024
+    SEARCH_CACHE_TTL = 600.0
+    CSV_BATCH_SIZE = 1000
+    DATA_SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "../../data/snapshots")
+    SESSION_BACKEND = "sqlite"
+    SESSION_DB_PATH = os.path.join(os.path.dirname(__file__), "../../sessions/sessions.db")
+    SESSION_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+    SESSION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    SESSION_CACHE_TTL = 900.0
+    CONVERSATION_MIRROR = "background"
+    MIRROR_QUEUE_SIZE = 1000
+    MIRROR_BATCH_SIZE = 10
+    MIRROR_MAX_RETRIES = 5
+    LLM_MAX_CONNECTIONS = 100
+    LLM_MAX_KEEPALIVE = 20
+    LLM_KEEPALIVE_EXPIRY = 60.0
+    LLM_TIMEOUT = 60.0
+    LLM_CONNECT_TIMEOUT = 5.0
+    ROUTER_MODE = "local"
+    ROUTER_MIN_CONFIDENCE = 0.9
+    STREAM_FLUSH_CHARS = 32
+    STREAM_FLUSH_INTERVAL = 0.05
+    SSE_HEARTBEAT_INTERVAL = 15.0
+    STREAM_REPLAY_EVENTS = 1024
+    STREAM_RETENTION = 120.0
+    STREAM_POLL_INTERVAL = 0.25
+    TOOL_WORKERS = 8
+    TOOL_TIMEOUT = 20.0
+    TOOL_TIMEOUTS = {}
+    CONTEXT_BUDGETS = {"supervisor": 400, "accounting": 3000, "support": 3000}
+    SUMMARY_TRIGGER_TOKENS = 2000
+    SUMMARY_KEEP_TOKENS = 1000
+    ANSWER_CACHE_ROUTES = {"support"}
+    ANSWER_CACHE_SIZE = 512
+    ANSWER_CACHE_TTL = 3600.0
+    ANSWER_CACHE_EMBEDDER = ""
+    ANSWER_CACHE_THRESHOLD = 0.92
+    IMPORT_WORKERS = 4
+    DATASET_POLL_INTERVAL = 30.0
 
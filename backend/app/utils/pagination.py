@@ -0,0 +1,18 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque page cursor holding the sort key of the last item returned"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[List]:
+    """The values passed to encode_cursor, or None for no cursor; raises ValueError when malformed"""
+    if not cursor:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError(f"Invalid cursor '{cursor}'")
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 """
-Migrate CSV data (accounting + support) into MongoDB
-Run once before starting the backend
+Import the CSV data (accounting + support) from backend/data into MongoDB
+Run before starting the backend, and again whenever the CSVs change: files are
+streamed in batches on a worker pool, unchanged files are skipped and files that
+only gained rows at the end are appended to instead of rewritten.
+
+Usage: python migrate_to_mongodb.py [--force] [--workers N] [FILE ...]
 """
 
+import argparse
 import os
 import sys
 from dotenv import load_dotenv
@@ -14,53 +19,65 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, BASE_DIR)
 sys.path.insert(0, os.path.join(BASE_DIR, "app"))
 
-from app.services.data_manager import data_manager
+from app.services.csv_importer import import_all, source_files
 from app.services.mongodb_data_service import mongodb_data_service
+from app.utils.config import IMPORT_WORKERS
 from app.utils.custom_logging import custom_logger
 
 
 log = custom_logger()
 
 
-def migrate_csv_data():
+def migrate_csv_data(names=None, force: bool = False, workers: int = IMPORT_WORKERS):
     if mongodb_data_service.csv_collection is None:
         log.error("❌ MongoDB not connected. Is the MongoDB container running?")
         return False
 
     log.info("✅ MongoDB connected")
-    log.info("📊 Loading CSV data...")
 
-    # Load CSVs into memory
-    data_manager.load_accounting_data()
-    data_manager.load_support_data()
+    files = source_files()
+    if names:
+        unknown = [n for n in names if n not in files]
+        if unknown:
+            log.error(f"❌ Unknown file(s): {', '.join(unknown)}. Known: {', '.join(files)}")
+            return False
+        files = {n: files[n] for n in names}
+
+    missing = [n for n, path in files.items() if not os.path.exists(path)]
+    if missing:
+        log.error(f"❌ CSV file(s) not found: {', '.join(missing)}")
+        return False
 
-    saved = 0
+    log.info(f"📊 Importing {len(files)} CSV files with {workers} workers...")
+    results = import_all(files, force=force, workers=workers)
 
-    # Save accounting CSVs
-    for file_name, df in data_manager.accounting_data.items():
-        if mongodb_data_service.save_csv_data(file_name, df):
-            saved += 1
+    for r in results:
+        print(f"  {r['file_name']:<40} {r['status']:<9} {r['rows']:>8} rows  {r['seconds']:>7.2f}s  {r['rows_per_sec']:>8} rows/sec")
 
-    # Save support CSV
-    if data_manager.support_data is not None:
-        if mongodb_data_service.save_csv_data(
-            "Smart_Metering_Support_Dataset.csv",
-            data_manager.support_data
-        ):
-            saved += 1
+    failed = [r["file_name"] for r in results if r["status"] == "failed"]
+    if failed:
+        log.error(f"❌ Import failed for: {', '.join(failed)}")
+        return False
 
-    log.info(f"✅ Migration completed. {saved} CSV files saved.")
+    log.info(f"✅ Migration completed. {sum(r['status'] != 'skipped' for r in results)} CSV files updated.")
     return True
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import backend/data CSV files into MongoDB")
+    parser.add_argument("files", nargs="*", help="only import these files (e.g. transaction.csv)")
+    parser.add_argument("--force", action="store_true", help="re-import even when the stored checksum matches")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="files imported concurrently")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("MongoDB CSV Migration Script")
     print("=" * 60)
 
-    success = migrate_csv_data()
+    success = migrate_csv_data(args.files, args.force, args.workers)
 
     if success:
         print("🎉 CSV data successfully migrated to MongoDB")
     else:
         print("❌ Migration failed")
+        sys.exit(1)
@@ -1,5 +1,7 @@
+# Workers share sessions through SESSION_BACKEND (SQLite file or MongoDB), so any
+# worker can serve any request; set WEB_CONCURRENCY to size the pool
 gunicorn app.main:app \
   -k uvicorn.workers.UvicornWorker \
-  -w 1 \
+  -w ${WEB_CONCURRENCY:-4} \
   --bind 0.0.0.0:8000 \
   --timeout 300
\ No newline at end of file
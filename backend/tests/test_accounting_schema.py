@@ -0,0 +1,17 @@
+import pandas as pd
+
+from app.services.accounting_schema import parse_date, parse_date_bound
+
+
+def test_day_first_bound_matches_day_first_row():
+    stored = parse_date(pd.Series(["05-11-2024", "11-05-2024"]))
+    low = parse_date_bound("05-11-2024")
+    high = parse_date_bound("05-11-2024", end=True)
+    assert low == pd.Timestamp(2024, 11, 5)
+    assert list((stored >= low) & (stored <= high)) == [True, False]
+
+
+def test_iso_and_month_bounds():
+    assert parse_date_bound("2024-11-05") == pd.Timestamp(2024, 11, 5)
+    assert parse_date_bound("2024-11") == pd.Timestamp(2024, 11, 1)
+    assert parse_date_bound("November 2024", end=True).date() == pd.Timestamp(2024, 11, 30).date()
@@ -0,0 +1,21 @@
+from app.services.answer_cache import AnswerCache
+
+
+def cache():
+    return AnswerCache(routes=["support"], max_entries=10, ttl_seconds=60, embedder="")
+
+
+def test_reworded_question_hits():
+    answers = cache()
+    answers.put("Can you explain why my bill is high?", "support", 1, "Usage went up.")
+    assert answers.get("why is my bill high", "support", 1) == "Usage went up."
+
+
+def test_different_content_words_or_version_miss():
+    answers = cache()
+    answers.put("How do I return an item?", "support", 1, "Use the returns form.")
+    assert answers.get("How do I exchange an item?", "support", 1) is None
+    assert answers.get("How do I not return an item?", "support", 1) is None
+    assert answers.get("How do I return an item?", "support", 2) is None
+    assert answers.get("How do I return an item?", "accounting", 1) is None
+    assert answers.stats()["misses"] == 3
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from app.services.session_store import SessionConflict, SessionStore
+
+
+def turn(n):
+    return [{"role": "user", "content": f"q{n}"}, {"role": "assistant", "content": f"a{n}"}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_concurrent_saves_at_one_version_conflict(store):
+    store.save_messages("s", turn(1))
+    messages, version = store.get_history("s")
+    barrier = threading.Barrier(2)
+    outcomes = []
+
+    def save(n):
+        barrier.wait()
+        try:
+            store.save_messages("s", messages + turn(n), expected_version=version)
+            outcomes.append("saved")
+        except SessionConflict:
+            outcomes.append("conflict")
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in (2, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ["conflict", "saved"]
+    assert store.get_session("s")["version"] == version + 1
+    assert len(store.get_messages("s")) == 4
+
+
+def test_extending_save_appends_the_tail(store):
+    store.save_messages("s", turn(1))
+    store.save_summary("s", "first turn", 2)
+    saved = store.save_messages("s", turn(1) + turn(2), expected_version=1)
+
+    assert saved["message_count"] == 4 and saved["version"] == 2
+    assert store.get_messages("s") == turn(1) + turn(2)
+    assert store.get_session("s")["summary"] == "first turn"
+
+
+def test_save_from_start_appends_after_the_stored_prefix(store):
+    store.save_messages("s", turn(1) + turn(2))
+    store.save_messages("s", turn(2) + turn(3), start=2)
+
+    assert store.get_messages("s") == turn(1) + turn(2) + turn(3)
+    assert store.get_history("s", start=4)[0] == turn(3)
+
+
+def test_diverging_save_replaces_stored_history(store):
+    store.save_messages("s", turn(1) + turn(2))
+    store.save_summary("s", "both turns", 4)
+    edited = turn(1) + [{"role": "user", "content": "edited"}]
+    saved = store.save_messages("s", edited)
+
+    assert saved["message_count"] == 3
+    assert store.get_messages("s") == edited
+    # The summary described messages that were replaced
+    assert store.get_session("s")["summary"] is None
+
+
+def test_save_from_past_the_stored_messages_conflicts(store):
+    store.save_messages("s", turn(1))
+    with pytest.raises(SessionConflict):
+        store.save_messages("s", turn(3), start=4)
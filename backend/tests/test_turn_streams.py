@@ -0,0 +1,52 @@
+import asyncio
+
+from app.services.stream_store import SQLiteStreamStore
+from app.services.turn_streams import TurnStream, TurnStreams
+
+
+def test_follow_replays_after_an_event_id():
+    async def run():
+        stream = TurnStream("t", "s")
+        for n in range(5):
+            await stream.publish("delta", {"n": n})
+        await stream.close()
+        return [item async for item in stream.follow(after=3)]
+
+    assert [(i, e, d["n"]) for i, e, d in asyncio.run(run())] == [(4, "delta", 3), (5, "delta", 4)]
+
+
+def test_follow_past_the_buffer_is_replay_expired():
+    async def run():
+        stream = TurnStream("t", "s", max_events=3)
+        for n in range(6):
+            await stream.publish("delta", {"n": n})
+        await stream.close()
+        return [item async for item in stream.follow(after=1)], [item[0] async for item in stream.follow(after=3)]
+
+    expired, kept = asyncio.run(run())
+    assert len(expired) == 1 and expired[0][2]["code"] == "replay_expired"
+    assert kept == [4, 5, 6]
+
+
+def test_another_worker_resumes_from_the_shared_store(tmp_path):
+    async def events():
+        for n in range(4):
+            await asyncio.sleep(0.02)
+            yield "delta", {"n": n}
+        yield "done", {}
+
+    async def run():
+        store = SQLiteStreamStore(str(tmp_path / "streams.db"))
+        running, other = TurnStreams(store=store), TurnStreams(store=store)
+        running.start("t", "s", events())
+        await asyncio.sleep(0.05)
+        stream = await other.find("t")
+        followed = [item async for item in stream.follow(after=2, heartbeat=5)]
+        return stream, followed, await other.find("missing")
+
+    stream, followed, missing = asyncio.run(run())
+    assert stream.session_id == "s"
+    # Event 1 is "start", so the deltas are events 2-5 and "done" is 6
+    assert [item[0] for item in followed] == [3, 4, 5, 6]
+    assert followed[-1][1] == "done"
+    assert missing is None
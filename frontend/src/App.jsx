@@ -10,6 +10,7 @@ function App() {
   const [input, setInput] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const [sessions, setSessions] = useState([])
+  const [sessionsCursor, setSessionsCursor] = useState(null)
   const [currentSessionId, setCurrentSessionId] = useState(null)
   const [searchQuery, setSearchQuery] = useState('')
   const [sidebarOpen, setSidebarOpen] = useState(true)
@@ -33,19 +34,35 @@ function App() {
     return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric', year: date.getFullYear() !== now.getFullYear() ? 'numeric' : undefined })
   }
 
-  // Load all sessions
+  // Load the first page of sessions (most recent first)
   const loadSessions = async () => {
     try {
       const response = await fetch(`${API_URL}/sessions`)
       const data = await response.json()
       if (data.sessions) {
         setSessions(data.sessions)
+        setSessionsCursor(data.next_cursor || null)
       }
     } catch (error) {
       console.error('Error loading sessions:', error)
     }
   }
 
+  // Append the next page of older sessions
+  const loadMoreSessions = async () => {
+    if (!sessionsCursor) return
+    try {
+      const response = await fetch(`${API_URL}/sessions?cursor=${encodeURIComponent(sessionsCursor)}`)
+      const data = await response.json()
+      if (data.sessions) {
+        setSessions(prev => [...prev, ...data.sessions.filter(s => !prev.some(p => p.session_id === s.session_id))])
+        setSessionsCursor(data.next_cursor || null)
+      }
+    } catch (error) {
+      console.error('Error loading more sessions:', error)
+    }
+  }
+
   // Load messages for a session
   const loadSessionMessages = async (sessionId) => {
     try {
@@ -264,6 +281,11 @@ function App() {
               </button>
             </div>
           ))}
+          {sessionsCursor && (
+            <button className="load-more-button" onClick={loadMoreSessions}>
+              Load more
+            </button>
+          )}
           {filteredSessions.length === 0 && sessions.length > 0 && (
             <div className="no-results">No chats found</div>
           )}